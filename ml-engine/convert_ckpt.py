@@ -0,0 +1,31 @@
+import argparse
+import json
+from pathlib import Path
+
+import torch
+from safetensors.torch import save_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a training checkpoint to .safetensors for inference")
+    parser.add_argument("--model", type=str, required=True, help="Path to .pt checkpoint")
+    parser.add_argument("--out", type=str, default=None, help="Output path (defaults to <model>.safetensors)")
+    args = parser.parse_args()
+
+    ckpt = torch.load(args.model, map_location="cpu")
+    out = args.out or str(Path(args.model).with_suffix(".safetensors"))
+
+    # Keep only the weights; training history and optimizer state are not needed for inference
+    state_dict = {k: v.contiguous() for k, v in ckpt["state_dict"].items()}
+    metadata = {
+        "cfg": json.dumps(ckpt["cfg"]),
+        "label_space": json.dumps(ckpt["label_space"]),
+    }
+
+    Path(out).parent.mkdir(parents=True, exist_ok=True)
+    save_file(state_dict, out, metadata=metadata)
+    print(f"saved safetensors checkpoint to {out}")
+
+
+if __name__ == "__main__":
+    main()
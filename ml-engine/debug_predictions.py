@@ -1,14 +1,14 @@
 import torch
 import numpy as np
 from transformers import AutoTokenizer
-from model import CodeBERTMultiLabel
+from model import CodeBERTMultiLabel, load_checkpoint
 import json
 
 def debug_model_predictions():
     """Debug model predictions to understand why it's not detecting vulnerabilities"""
     
     # Load model
-    ckpt = torch.load('models/codebert_multilabel.pt', map_location='cpu')
+    ckpt = load_checkpoint('models/codebert_multilabel.pt')
     cfg = ckpt["cfg"]
     label_space = ckpt["label_space"]
     
@@ -18,8 +18,8 @@ def debug_model_predictions():
     model.eval()
     
     # Load a sample of vulnerable code
-    with open('../datasets/processed/unified_dataset.json', 'r') as f:
-        data = json.load(f)
+    with open('../datasets/processed/unified_dataset.jsonl', 'r') as f:
+        data = [json.loads(line) for line in f if line.strip()]
     
     # Find a vulnerable contract
     vulnerable_sample = None
@@ -7,7 +7,7 @@ import numpy as np
 from sklearn.metrics import f1_score
 
 from preprocessing import load_unified_json, build_label_space, multilabel_targets
-from model import CodeBERTMultiLabel
+from model import CodeBERTMultiLabel, load_checkpoint
 
 
 class ContractsDataset(Dataset):
@@ -40,7 +40,7 @@ def main():
     parser.add_argument("--model", type=str, required=True)
     args = parser.parse_args()
 
-    ckpt = torch.load(args.model, map_location="cpu")
+    ckpt = load_checkpoint(args.model)
     cfg = ckpt["cfg"]
     label_space = ckpt["label_space"]
     inv = {i: k for k, i in label_space.items()}
@@ -8,7 +8,7 @@ from sklearn.metrics import f1_score, precision_score, recall_score, accuracy_sc
 import json
 
 from preprocessing import load_unified_json, build_label_space, multilabel_targets
-from model import CodeBERTMultiLabel
+from model import CodeBERTMultiLabel, load_checkpoint
 
 
 class ContractsDataset(Dataset):
@@ -127,7 +127,7 @@ def main():
     args = parser.parse_args()
 
     print(f"Loading model from {args.model}")
-    ckpt = torch.load(args.model, map_location="cpu")
+    ckpt = load_checkpoint(args.model)
     cfg = ckpt["cfg"]
     label_space = ckpt["label_space"]
     
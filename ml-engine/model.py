@@ -1,6 +1,9 @@
-from typing import List
+import json
+from typing import Any, Dict, List
 
 import torch
+from safetensors import safe_open
+from safetensors.torch import load_file, save_file
 from torch import nn
 from transformers import AutoConfig, AutoModel
 
@@ -25,6 +28,16 @@ class CodeBERTMultiLabel(nn.Module):
         logits = self.classifier(pooled)
         return logits
 
+    def freeze_lower_layers(self, num_layers: int) -> None:
+        """Freeze embeddings and the first num_layers encoder layers"""
+        if num_layers <= 0:
+            return
+        for p in self.encoder.embeddings.parameters():
+            p.requires_grad_(False)
+        for layer in self.encoder.encoder.layer[:num_layers]:
+            for p in layer.parameters():
+                p.requires_grad_(False)
+
     @staticmethod
     def loss_fn(logits: torch.Tensor, labels: torch.Tensor) -> torch.Tensor:
         return nn.BCEWithLogitsLoss()(logits, labels)
@@ -34,3 +47,46 @@ class CodeBERTMultiLabel(nn.Module):
         return torch.sigmoid(logits)
 
 
+DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+
+def _to_device(enc) -> Dict[str, torch.Tensor]:
+    if DEVICE.type == "cuda":
+        return {k: v.pin_memory().to(DEVICE, non_blocking=True) for k, v in enc.items()}
+    return dict(enc)
+
+
+def _release_cache():
+    if DEVICE.type == "cuda":
+        torch.cuda.empty_cache()
+
+
+def load_checkpoint(path: str) -> Dict[str, Any]:
+    """Load a training checkpoint (.pt) or a converted, mmap-backed .safetensors file"""
+    if str(path).endswith(".safetensors"):
+        with safe_open(path, framework="pt") as f:
+            metadata = f.metadata()
+        return {
+            "state_dict": load_file(path, device="cpu"),
+            "cfg": json.loads(metadata["cfg"]),
+            "label_space": json.loads(metadata["label_space"]),
+        }
+    ckpt = torch.load(path, map_location="cpu")
+    if ckpt.pop("dtype", None) == "bfloat16":
+        ckpt["state_dict"] = {k: v.float() if v.is_floating_point() else v for k, v in ckpt["state_dict"].items()}
+    return ckpt
+
+
+def bf16_state_dict(model: nn.Module) -> Dict[str, torch.Tensor]:
+    """Cast floating point weights to bfloat16 to halve checkpoint size"""
+    return {k: v.to(torch.bfloat16) if v.is_floating_point() else v for k, v in model.state_dict().items()}
+
+
+def save_checkpoint(path: str, model: nn.Module, **meta: Any) -> None:
+    """Save bfloat16 weights as .safetensors (cfg and label_space metadata) or as a .pt checkpoint with meta"""
+    state_dict = bf16_state_dict(model)
+    if str(path).endswith(".safetensors"):
+        metadata = {"cfg": json.dumps(meta["cfg"]), "label_space": json.dumps(meta["label_space"])}
+        save_file({k: v.contiguous() for k, v in state_dict.items()}, str(path), metadata=metadata)
+    else:
+        torch.save({**meta, "state_dict": state_dict, "dtype": "bfloat16"}, path)
@@ -1,51 +1,66 @@
 import argparse
 import hashlib
 import json
-from typing import Dict, List
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
 
 import torch
 from transformers import AutoTokenizer
 
-from model import CodeBERTMultiLabel
+from model import DEVICE, CodeBERTMultiLabel, _release_cache, _to_device, load_checkpoint
 
 
 def sha256_hex(text: str) -> str:
     return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
 
-@torch.no_grad()
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--model", type=str, required=True)
-    parser.add_argument("--source", type=str, required=True)
-    args = parser.parse_args()
-
-    ckpt = torch.load(args.model, map_location="cpu")
+@lru_cache(maxsize=None)
+def _load(model_path: str) -> Tuple[Any, CodeBERTMultiLabel, Dict[str, Any], Dict[int, str]]:
+    ckpt = load_checkpoint(model_path)
     cfg = ckpt["cfg"]
     label_space: Dict[str, int] = ckpt["label_space"]
     inv = {i: k for k, i in label_space.items()}
 
-    with open(args.source, "r", encoding="utf-8") as f:
-        code = f.read()
-
     tokenizer = AutoTokenizer.from_pretrained(cfg["model_name"])
     model = CodeBERTMultiLabel(cfg["model_name"], num_labels=len(label_space))
     model.load_state_dict(ckpt["state_dict"])
+    model.to(DEVICE)
     model.eval()
+    return tokenizer, model, cfg, inv
+
+
+@torch.inference_mode()
+def predict_code(code: str, model_path: str) -> Dict[str, Any]:
+    tokenizer, model, cfg, inv = _load(model_path)
 
     enc = tokenizer(code, max_length=cfg["max_length"], truncation=True, padding="max_length", return_tensors="pt")
+    enc = _to_device(enc)
     logits = model(enc["input_ids"], enc["attention_mask"]) 
     probs = torch.sigmoid(logits).squeeze(0).tolist()
+    del enc, logits
+    _release_cache()
 
     results = []
     for idx, p in enumerate(probs):
         results.append({"vulnerability": inv[idx], "probability": float(p)})
 
-    out = {
+    return {
         "contract_hash": sha256_hex(code),
         "predictions": results,
         "risk_score": sum([r["probability"] for r in results]) / max(1, len(results))
     }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", type=str, required=True)
+    parser.add_argument("--source", type=str, required=True)
+    args = parser.parse_args()
+
+    with open(args.source, "r", encoding="utf-8") as f:
+        code = f.read()
+
+    out = predict_code(code, args.model)
     print(json.dumps(out, indent=2))
 
 
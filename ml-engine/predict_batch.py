@@ -0,0 +1,60 @@
+import argparse
+import json
+from typing import Any, Dict, List
+
+import torch
+
+from model import _to_device
+from predict import _load, sha256_hex
+
+
+@torch.inference_mode()
+def predict_batch(codes: List[str], model_path: str, batch_size: int = 16) -> List[Dict[str, Any]]:
+    tokenizer, model, cfg, inv = _load(model_path)
+
+    # Sort by length so each batch pads to a similar longest sequence
+    order = sorted(range(len(codes)), key=lambda i: len(codes[i]))
+    results: List[Dict[str, Any]] = [None] * len(codes)
+
+    for start in range(0, len(order), batch_size):
+        chunk = order[start:start + batch_size]
+        enc = tokenizer(
+            [codes[i] for i in chunk],
+            max_length=cfg["max_length"],
+            truncation=True,
+            padding=True,
+            return_tensors="pt",
+        )
+        enc = _to_device(enc)
+        logits = model(enc["input_ids"], enc["attention_mask"])
+        probs = torch.sigmoid(logits).tolist()
+
+        for i, row in zip(chunk, probs):
+            predictions = [{"vulnerability": inv[idx], "probability": float(p)} for idx, p in enumerate(row)]
+            results[i] = {
+                "contract_hash": sha256_hex(codes[i]),
+                "predictions": predictions,
+                "risk_score": sum(row) / max(1, len(row)),
+            }
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", type=str, required=True)
+    parser.add_argument("--source", type=str, nargs="+", required=True)
+    parser.add_argument("--batch", type=int, default=16)
+    args = parser.parse_args()
+
+    codes = []
+    for path in args.source:
+        with open(path, "r", encoding="utf-8") as f:
+            codes.append(f.read())
+
+    out = predict_batch(codes, args.model, batch_size=args.batch)
+    print(json.dumps(out, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,14 +2,23 @@ import argparse
 import hashlib
 import json
 import re
-from typing import Dict, List, Tuple
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
 import matplotlib.pyplot as plt
 import numpy as np
+from PIL import Image
 
 import torch
 from transformers import AutoTokenizer
 
-from model import CodeBERTMultiLabel
+from model import DEVICE, CodeBERTMultiLabel, _release_cache, _to_device, load_checkpoint
+
+
+# Probability > boundary[i] maps to SEVERITY_LEVELS[i + 1]
+SEVERITY_BOUNDARIES = torch.tensor([0.4, 0.6, 0.8])
+SEVERITY_LEVELS = ("LOW", "MEDIUM", "HIGH", "CRITICAL")
+
+HEATMAP_CMAP = plt.get_cmap('Reds')
 
 
 def sha256_hex(text: str) -> str:
@@ -64,30 +73,26 @@ def extract_line_numbers(code: str, vulnerability_type: str) -> List[int]:
     return suspicious_lines[:5]  # Return top 5 suspicious lines
 
 
-def generate_attention_heatmap(tokens: List[str], attention_weights: torch.Tensor, 
-                             vulnerability_type: str, output_path: str = None) -> str:
+def generate_attention_heatmap(attention_np: np.ndarray, vulnerability_type: str,
+                               output_path: str = None) -> str:
     """Generate attention weight visualization"""
-    if len(tokens) > 100:  # Limit for visualization
-        tokens = tokens[:100]
-        attention_weights = attention_weights[:100]
+    row = attention_np.reshape(1, -1)
     
-    plt.figure(figsize=(12, 6))
-    attention_np = attention_weights.detach().cpu().numpy()
+    if output_path:
+        # Map through the colormap LUT directly instead of rendering a Matplotlib figure
+        peak = row.max()
+        rgba = (HEATMAP_CMAP(row / peak if peak > 0 else row) * 255).astype(np.uint8)
+        Image.fromarray(rgba).resize((1200, 120), Image.NEAREST).save(output_path)
+        return output_path
     
-    # Create heatmap
-    plt.imshow(attention_np.reshape(1, -1), cmap='Reds', aspect='auto')
+    plt.figure(figsize=(12, 6))
+    plt.imshow(row, cmap='Reds', aspect='auto')
     plt.colorbar()
     plt.title(f'Attention Weights for {vulnerability_type}')
     plt.xlabel('Token Position')
     plt.yticks([])
-    
-    if output_path:
-        plt.savefig(output_path, dpi=150, bbox_inches='tight')
-        plt.close()
-        return output_path
-    else:
-        plt.show()
-        return "heatmap_displayed"
+    plt.show()
+    return "heatmap_displayed"
 
 
 def calculate_confidence_score(probability: float, line_evidence: List[int]) -> float:
@@ -158,67 +163,77 @@ def get_fix_suggestions(vulnerability_type: str) -> Dict[str, str]:
     })
 
 
-@torch.no_grad()
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--model", type=str, required=True)
-    parser.add_argument("--source", type=str, required=True)
-    parser.add_argument("--output-heatmap", action="store_true", help="Generate attention heatmap")
-    args = parser.parse_args()
-
-    ckpt = torch.load(args.model, map_location="cpu")
+@lru_cache(maxsize=None)
+def _load(model_path: str) -> Tuple[Any, CodeBERTMultiLabel, Dict[str, Any], Dict[int, str]]:
+    """Load tokenizer, model and label space once per process"""
+    ckpt = load_checkpoint(model_path)
     cfg = ckpt["cfg"]
     label_space: Dict[str, int] = ckpt["label_space"]
     inv = {i: k for k, i in label_space.items()}
 
-    with open(args.source, "r", encoding="utf-8") as f:
-        code = f.read()
-
     tokenizer = AutoTokenizer.from_pretrained(cfg["model_name"])
     model = CodeBERTMultiLabel(cfg["model_name"], num_labels=len(label_space))
     model.load_state_dict(ckpt["state_dict"])
+    model.to(DEVICE)
     model.eval()
+    return tokenizer, model, cfg, inv
+
+
+@torch.inference_mode()
+def predict_code(code: str, model_path: str, output_heatmap: bool = False) -> Dict[str, Any]:
+    """Analyze a single contract and return the enhanced prediction report"""
+    tokenizer, model, cfg, inv = _load(model_path)
 
     # Tokenize and get model outputs
     enc = tokenizer(code, max_length=cfg["max_length"], truncation=True, 
                    padding="max_length", return_tensors="pt")
+    enc = _to_device(enc)
     
     # Get attention weights if model supports it
     outputs = model.encoder(**enc, output_attentions=True)
     attention_weights = outputs.attentions[-1].mean(dim=1).squeeze()  # Last layer attention
+    attention_np = attention_weights[:100].detach().cpu().numpy()  # Limit for visualization
+    del outputs, attention_weights
     
     logits = model(enc["input_ids"], enc["attention_mask"]) 
-    probs = torch.sigmoid(logits).squeeze(0).tolist()
+    probs_t = torch.sigmoid(logits).squeeze(0)
+
+    # Only materialize predictions above threshold
+    idx_keep = torch.nonzero(probs_t > 0.3, as_tuple=False).squeeze(-1)
+    p_keep = probs_t[idx_keep]
+    severity_keep = torch.bucketize(p_keep, SEVERITY_BOUNDARIES.to(p_keep.device)).tolist()
+    idx_keep, p_keep = idx_keep.tolist(), p_keep.tolist()
+
+    # Release encoder activations before the regex / heatmap work below
+    del enc, logits, probs_t
+    _release_cache()
 
     # Enhanced predictions with explainability
     enhanced_predictions = []
     all_fix_suggestions = {}
     
-    for idx, p in enumerate(probs):
+    for idx, p, level in zip(idx_keep, p_keep, severity_keep):
         vuln_type = inv[idx]
-        if p > 0.3:  # Only include predictions above threshold
-            line_evidence = extract_line_numbers(code, vuln_type)
-            confidence = calculate_confidence_score(p, line_evidence)
-            
-            prediction = {
-                "vulnerability": vuln_type,
-                "probability": float(p),
-                "confidence": float(confidence),
-                "lines": line_evidence,
-                "severity": "CRITICAL" if p > 0.8 else "HIGH" if p > 0.6 else "MEDIUM" if p > 0.4 else "LOW"
-            }
-            
-            enhanced_predictions.append(prediction)
-            all_fix_suggestions[vuln_type] = get_fix_suggestions(vuln_type)
-            
-            # Generate heatmap for high-confidence predictions
-            if args.output_heatmap and p > 0.7:
-                tokens = tokenizer.convert_ids_to_tokens(enc["input_ids"][0])
-                heatmap_path = generate_attention_heatmap(
-                    tokens, attention_weights, vuln_type, 
-                    f"heatmap_{vuln_type}.png"
-                )
-                prediction["attention_heatmap"] = heatmap_path
+        line_evidence = extract_line_numbers(code, vuln_type)
+        confidence = calculate_confidence_score(p, line_evidence)
+        
+        prediction = {
+            "vulnerability": vuln_type,
+            "probability": float(p),
+            "confidence": float(confidence),
+            "lines": line_evidence,
+            "severity": SEVERITY_LEVELS[level]
+        }
+        
+        enhanced_predictions.append(prediction)
+        all_fix_suggestions[vuln_type] = get_fix_suggestions(vuln_type)
+        
+        # Generate heatmap for high-confidence predictions
+        if output_heatmap and p > 0.7:
+            heatmap_path = generate_attention_heatmap(
+                attention_np, vuln_type, f"heatmap_{vuln_type}.png"
+            )
+            prediction["attention_heatmap"] = heatmap_path
 
     # Calculate enhanced risk score
     if enhanced_predictions:
@@ -231,7 +246,7 @@ def main():
     ai_summary = generate_ai_summary(enhanced_predictions, risk_score)
 
     # Final output
-    out = {
+    return {
         "contract_hash": sha256_hex(code),
         "predictions": enhanced_predictions,
         "risk_score": float(risk_score),
@@ -240,11 +255,23 @@ def main():
         "analysis_metadata": {
             "model_version": "1.0",
             "confidence_threshold": 0.3,
-            "total_vulnerabilities_checked": len(label_space),
+            "total_vulnerabilities_checked": len(inv),
             "vulnerabilities_found": len(enhanced_predictions)
         }
     }
-    
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", type=str, required=True)
+    parser.add_argument("--source", type=str, required=True)
+    parser.add_argument("--output-heatmap", action="store_true", help="Generate attention heatmap")
+    args = parser.parse_args()
+
+    with open(args.source, "r", encoding="utf-8") as f:
+        code = f.read()
+
+    out = predict_code(code, args.model, output_heatmap=args.output_heatmap)
     print(json.dumps(out, indent=2))
 
 
@@ -9,8 +9,17 @@ import pandas as pd
 def load_unified_json(dataset_path: str) -> pd.DataFrame:
     if not os.path.exists(dataset_path):
         raise FileNotFoundError(f"Dataset not found at {dataset_path}")
+    if dataset_path.endswith(".parquet"):
+        df = pd.read_parquet(dataset_path)
+        # List columns come back as numpy arrays; keep the JSON shape
+        for col in ("vulnerabilities", "severity"):
+            df[col] = df[col].map(list)
+        return df
     with open(dataset_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+        if dataset_path.endswith(".jsonl"):
+            data = [json.loads(line) for line in f if line.strip()]
+        else:
+            data = json.load(f)
     return pd.DataFrame(data)
 
 
@@ -28,8 +37,8 @@ def multilabel_targets(labels: List[List[str]], label_space: Dict[str, int]) ->
 
 
 def train_val_split(df: pd.DataFrame, val_ratio: float = 0.1, seed: int = 42) -> Tuple[pd.DataFrame, pd.DataFrame]:
-    df = df.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+    idx = np.random.default_rng(seed).permutation(len(df))
     split = int(len(df) * (1 - val_ratio))
-    return df.iloc[:split], df.iloc[split:]
+    return df.take(idx[:split]), df.take(idx[split:])
 
 
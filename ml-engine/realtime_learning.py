@@ -5,22 +5,24 @@ Real-time learning system for SecuRizz AI
 
 import asyncio
 import json
-import torch
-import numpy as np
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
 import threading
-import queue
-import time
+from collections import Counter, deque
 from pathlib import Path
 
+from model import CodeBERTMultiLabel, load_checkpoint, save_checkpoint
+
 class RealTimeLearningSystem:
     def __init__(self, model_path: str = "models/codebert_final.pt"):
         self.model_path = Path(model_path)
-        self.feedback_queue = queue.Queue()
+        self.feedback_queue = deque()
+        self.feedback_cv = threading.Condition()
         self.learning_active = False
         self.model_version = "1.0.0"
         self.learning_thread = None
+        self._model = None
+        self._checkpoint_meta = {}
         
         # Learning parameters
         self.learning_rate = 0.001
@@ -46,7 +48,9 @@ class RealTimeLearningSystem:
 
     def stop_learning(self):
         """Stop real-time learning system"""
-        self.learning_active = False
+        with self.feedback_cv:
+            self.learning_active = False
+            self.feedback_cv.notify_all()
         if self.learning_thread:
             self.learning_thread.join()
         print("⏹️ Real-time learning system stopped")
@@ -58,8 +62,10 @@ class RealTimeLearningSystem:
             if self._validate_feedback(feedback):
                 feedback["timestamp"] = datetime.utcnow().isoformat()
                 feedback["processed"] = False
-                self.feedback_queue.put(feedback)
-                self.feedback_count += 1
+                with self.feedback_cv:
+                    self.feedback_queue.append(feedback)
+                    self.feedback_count += 1
+                    self.feedback_cv.notify()
                 print(f"📝 Feedback added to learning queue ({self.feedback_count} total)")
                 return True
             return False
@@ -112,32 +118,36 @@ class RealTimeLearningSystem:
         """Main learning loop running in background thread"""
         while self.learning_active:
             try:
+                # Wake as soon as enough feedback arrives, or at least every minute
+                with self.feedback_cv:
+                    ready = self.feedback_cv.wait_for(
+                        lambda: len(self.feedback_queue) >= self.min_feedback_count or not self.learning_active,
+                        timeout=60,
+                    )
+                if not self.learning_active:
+                    break
+                
                 # Check if we have enough feedback for learning
-                if self.feedback_queue.qsize() >= self.min_feedback_count:
+                if ready:
                     self._process_feedback_batch()
                 
                 # Check if it's time for model update
                 if self._should_update_model():
                     self._update_model()
                 
-                time.sleep(60)  # Check every minute
-                
             except Exception as e:
                 print(f"❌ Learning loop error: {str(e)}")
-                time.sleep(60)
+                with self.feedback_cv:
+                    self.feedback_cv.wait_for(lambda: not self.learning_active, timeout=60)
 
     def _process_feedback_batch(self):
         """Process a batch of feedback for learning"""
         try:
-            batch = []
-            batch_size = min(self.batch_size, self.feedback_queue.qsize())
-            
             # Collect feedback batch
-            for _ in range(batch_size):
-                if not self.feedback_queue.empty():
-                    feedback = self.feedback_queue.get()
-                    if not feedback.get("processed", False):
-                        batch.append(feedback)
+            with self.feedback_cv:
+                batch_size = min(self.batch_size, len(self.feedback_queue))
+                batch = [self.feedback_queue.popleft() for _ in range(batch_size)]
+            batch = [feedback for feedback in batch if not feedback.get("processed", False)]
             
             if not batch:
                 return
@@ -161,51 +171,47 @@ class RealTimeLearningSystem:
 
     def _calculate_learning_metrics(self, batch: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Calculate learning metrics from feedback batch"""
-        metrics = {
-            "accuracy_scores": [],
-            "vulnerability_accuracy": {},
-            "false_positives": 0,
-            "false_negatives": 0,
-            "improvement_areas": []
-        }
+        total = Counter()
+        correct = Counter()
+        accuracy_sum = 0.0
+        false_positives = 0
+        false_negatives = 0
         
         for feedback in batch:
             # Collect accuracy scores
-            accuracy = feedback.get("accuracy_rating", 0)
-            metrics["accuracy_scores"].append(accuracy)
+            accuracy_sum += feedback.get("accuracy_rating", 0)
             
             # Analyze vulnerability predictions
             predicted = set(feedback.get("predicted_vulnerabilities", []))
             actual = set(feedback.get("actual_vulnerabilities", []))
             
             # Calculate precision and recall
-            true_positives = len(predicted.intersection(actual))
-            false_positives = len(predicted - actual)
-            false_negatives = len(actual - predicted)
-            
-            metrics["false_positives"] += false_positives
-            metrics["false_negatives"] += false_negatives
+            false_positives += len(predicted - actual)
+            false_negatives += len(actual - predicted)
             
             # Track per-vulnerability accuracy
-            for vuln in actual:
-                if vuln not in metrics["vulnerability_accuracy"]:
-                    metrics["vulnerability_accuracy"][vuln] = {"correct": 0, "total": 0}
-                
-                metrics["vulnerability_accuracy"][vuln]["total"] += 1
-                if vuln in predicted:
-                    metrics["vulnerability_accuracy"][vuln]["correct"] += 1
+            total.update(actual)
+            correct.update(predicted & actual)
+        
+        metrics = {
+            "vulnerability_accuracy": {
+                vuln: {"correct": correct[vuln], "total": count} for vuln, count in total.items()
+            },
+            "false_positives": false_positives,
+            "false_negatives": false_negatives,
+            "improvement_areas": []
+        }
         
         # Calculate overall accuracy
-        if metrics["accuracy_scores"]:
-            metrics["average_accuracy"] = np.mean(metrics["accuracy_scores"])
+        if batch:
+            metrics["average_accuracy"] = accuracy_sum / len(batch)
         
         return metrics
 
     def _apply_feedback_learning(self, batch: List[Dict[str, Any]], metrics: Dict[str, Any]):
         """Apply feedback learning to model"""
         try:
-            # Load current model
-            model = torch.load(self.model_path, map_location='cpu')
+            model = self._get_model()
             
             # Create learning dataset from feedback
             learning_data = self._prepare_learning_data(batch)
@@ -214,7 +220,7 @@ class RealTimeLearningSystem:
             self._apply_gradient_updates(model, learning_data, metrics)
             
             # Save updated model
-            torch.save(model, self.model_path)
+            self._save_model()
             
             # Update model version
             self._increment_model_version()
@@ -304,14 +310,13 @@ class RealTimeLearningSystem:
         try:
             print("🔄 Updating model with latest learning...")
             
-            # Load current model
-            model = torch.load(self.model_path)
+            model = self._get_model()
             
             # Apply accumulated learning
             # ... (implement model update logic)
             
             # Save updated model
-            torch.save(model, self.model_path)
+            self._save_model()
             
             # Update tracking
             self.last_update = datetime.utcnow()
@@ -322,6 +327,21 @@ class RealTimeLearningSystem:
         except Exception as e:
             print(f"❌ Model update failed: {str(e)}")
 
+    def _get_model(self) -> CodeBERTMultiLabel:
+        """Load the model once and keep it in memory across learning cycles"""
+        if self._model is None:
+            ckpt = load_checkpoint(str(self.model_path))
+            self._checkpoint_meta = {k: v for k, v in ckpt.items() if k != "state_dict"}
+            cfg = ckpt["cfg"]
+            model = CodeBERTMultiLabel(cfg["model_name"], num_labels=len(ckpt["label_space"]))
+            model.load_state_dict(ckpt["state_dict"])
+            self._model = model
+        return self._model
+
+    def _save_model(self):
+        """Persist the weights in the same bfloat16 checkpoint layout train.py writes"""
+        save_checkpoint(str(self.model_path), self._model, **self._checkpoint_meta)
+
     def _increment_model_version(self):
         """Increment model version after update"""
         version_parts = self.model_version.split(".")
@@ -345,7 +365,7 @@ class RealTimeLearningSystem:
             "model_version": self.model_version,
             "learning_active": self.learning_active,
             "feedback_count": self.feedback_count,
-            "queue_size": self.feedback_queue.qsize(),
+            "queue_size": len(self.feedback_queue),
             "last_update": self.last_update.isoformat(),
             "accuracy_history": self.accuracy_history[-10:],
             "learning_rate": self.learning_rate,
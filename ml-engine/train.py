@@ -1,4 +1,5 @@
 import argparse
+import functools
 import json
 from pathlib import Path
 
@@ -8,60 +9,79 @@ from transformers import AutoTokenizer
 import yaml
 
 from preprocessing import load_unified_json, build_label_space, multilabel_targets, train_val_split
-from model import CodeBERTMultiLabel
+from model import CodeBERTMultiLabel, save_checkpoint
 
 
 class ContractsDataset(Dataset):
     def __init__(self, texts, labels, tokenizer, max_length):
-        self.texts = texts
-        self.labels = labels
-        self.tokenizer = tokenizer
-        self.max_length = max_length
+        # Tokenize the whole corpus once up front instead of per item per epoch;
+        # padding is deferred to collate() so each batch pads to its own longest sample
+        enc = tokenizer(
+            list(texts),
+            max_length=max_length,
+            truncation=True,
+            padding=False,
+        )
+        self.input_ids = enc["input_ids"]
+        self.attention_mask = enc["attention_mask"]
+        self.labels = torch.as_tensor(labels, dtype=torch.float32).contiguous()
 
     def __len__(self):
-        return len(self.texts)
+        return len(self.input_ids)
 
     def __getitem__(self, idx):
-        enc = self.tokenizer(
-            self.texts[idx],
-            max_length=self.max_length,
-            truncation=True,
-            padding="max_length",
-            return_tensors="pt",
-        )
-        item = {k: v.squeeze(0) for k, v in enc.items()}
-        item["labels"] = torch.tensor(self.labels[idx], dtype=torch.float32)
-        return item
+        return {
+            "input_ids": self.input_ids[idx],
+            "attention_mask": self.attention_mask[idx],
+            "labels": self.labels[idx],
+        }
+
+
+def collate(batch, tokenizer):
+    padded = tokenizer.pad(
+        {
+            "input_ids": [b["input_ids"] for b in batch],
+            "attention_mask": [b["attention_mask"] for b in batch],
+        },
+        return_tensors="pt",
+    )
+    padded["labels"] = torch.stack([b["labels"] for b in batch])
+    return padded
 
 
-def train_epoch(model, dataloader, optimizer, device):
+def train_epoch(model, dataloader, optimizer, scaler, device, grad_accum=1):
     model.train()
-    total = 0.0
-    for batch in dataloader:
-        input_ids = batch["input_ids"].to(device)
-        attention_mask = batch["attention_mask"].to(device)
-        labels = batch["labels"].to(device)
-        logits = model(input_ids, attention_mask)
-        loss = model.loss_fn(logits, labels)
-        loss.backward()
-        optimizer.step()
-        optimizer.zero_grad(set_to_none=True)
-        total += loss.item()
-    return total / max(1, len(dataloader))
-
-
-@torch.no_grad()
+    total = torch.zeros((), device=device)
+    for batch_idx, batch in enumerate(dataloader):
+        input_ids = batch["input_ids"].to(device, non_blocking=True)
+        attention_mask = batch["attention_mask"].to(device, non_blocking=True)
+        labels = batch["labels"].to(device, non_blocking=True)
+        with torch.autocast(device_type=device.type, dtype=torch.float16, enabled=device.type == "cuda"):
+            logits = model(input_ids, attention_mask)
+            loss = model.loss_fn(logits, labels)
+        scaler.scale(loss / grad_accum).backward()
+        # Step once every grad_accum micro-batches (and on the last batch)
+        if (batch_idx + 1) % grad_accum == 0 or batch_idx + 1 == len(dataloader):
+            scaler.step(optimizer)
+            scaler.update()
+            optimizer.zero_grad(set_to_none=True)
+        total += loss.detach()
+    return total.item() / max(1, len(dataloader))
+
+
+@torch.inference_mode()
 def eval_epoch(model, dataloader, device):
     model.eval()
-    total = 0.0
+    total = torch.zeros((), device=device)
     for batch in dataloader:
-        input_ids = batch["input_ids"].to(device)
-        attention_mask = batch["attention_mask"].to(device)
-        labels = batch["labels"].to(device)
-        logits = model(input_ids, attention_mask)
-        loss = model.loss_fn(logits, labels)
-        total += loss.item()
-    return total / max(1, len(dataloader))
+        input_ids = batch["input_ids"].to(device, non_blocking=True)
+        attention_mask = batch["attention_mask"].to(device, non_blocking=True)
+        labels = batch["labels"].to(device, non_blocking=True)
+        with torch.autocast(device_type=device.type, dtype=torch.float16, enabled=device.type == "cuda"):
+            logits = model(input_ids, attention_mask)
+            loss = model.loss_fn(logits, labels)
+        total += loss.detach()
+    return total.item() / max(1, len(dataloader))
 
 
 def main():
@@ -72,6 +92,9 @@ def main():
     parser.add_argument("--batch", type=int, default=4)
     parser.add_argument("--epochs", type=int, default=1)
     parser.add_argument("--lr", type=float, default=5e-5)
+    parser.add_argument("--freeze-layers", type=int, default=0, help="Freeze embeddings and the first N encoder layers")
+    parser.add_argument("--grad-accum", type=int, default=1, help="Micro-batches per optimizer step")
+    parser.add_argument("--workers", type=int, default=2, help="DataLoader worker processes")
     args = parser.parse_args()
 
     cfg = yaml.safe_load(open(args.config))
@@ -79,40 +102,51 @@ def main():
     label_space = build_label_space(vulns)
 
     df = load_unified_json(args.data)
-    texts = df["source_code"].tolist()
-    labels = multilabel_targets(df["vulnerabilities"].tolist(), label_space)
+    all_labels = multilabel_targets(df["vulnerabilities"].tolist(), label_space)
 
     train_df, val_df = train_val_split(df)
-    tokenizer = AutoTokenizer.from_pretrained(cfg["model_name"])
+    tokenizer = AutoTokenizer.from_pretrained(cfg["model_name"], use_fast=True)
+    if not tokenizer.is_fast:
+        raise RuntimeError(f"No fast tokenizer available for {cfg['model_name']}")
 
     train_dataset = ContractsDataset(
         train_df["source_code"].tolist(),
-        multilabel_targets(train_df["vulnerabilities"].tolist(), label_space),
+        all_labels[train_df.index.to_numpy()],
         tokenizer,
         cfg["max_length"],
     )
     val_dataset = ContractsDataset(
         val_df["source_code"].tolist(),
-        multilabel_targets(val_df["vulnerabilities"].tolist(), label_space),
+        all_labels[val_df.index.to_numpy()],
         tokenizer,
         cfg["max_length"],
     )
 
     model = CodeBERTMultiLabel(cfg["model_name"], num_labels=len(label_space))
+    model.freeze_lower_layers(args.freeze_layers)
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     model.to(device)
-    optimizer = torch.optim.AdamW(model.parameters(), lr=args.lr)
-
-    train_loader = DataLoader(train_dataset, batch_size=args.batch, shuffle=True)
-    val_loader = DataLoader(val_dataset, batch_size=args.batch)
+    optimizer = torch.optim.AdamW([p for p in model.parameters() if p.requires_grad], lr=args.lr)
+    scaler = torch.cuda.amp.GradScaler(enabled=device.type == "cuda")
+
+    loader_kwargs = {
+        "batch_size": args.batch,
+        "collate_fn": functools.partial(collate, tokenizer=tokenizer),
+        "num_workers": args.workers,
+        "pin_memory": device.type == "cuda",
+    }
+    if args.workers > 0:
+        loader_kwargs.update(persistent_workers=True, prefetch_factor=4)
+    train_loader = DataLoader(train_dataset, shuffle=True, **loader_kwargs)
+    val_loader = DataLoader(val_dataset, **loader_kwargs)
 
     for epoch in range(args.epochs):
-        tr_loss = train_epoch(model, train_loader, optimizer, device)
+        tr_loss = train_epoch(model, train_loader, optimizer, scaler, device, args.grad_accum)
         va_loss = eval_epoch(model, val_loader, device)
         print(f"epoch={epoch} train_loss={tr_loss:.4f} val_loss={va_loss:.4f}")
 
     Path(args.out).parent.mkdir(parents=True, exist_ok=True)
-    torch.save({"state_dict": model.state_dict(), "label_space": label_space, "cfg": cfg}, args.out)
+    save_checkpoint(args.out, model, label_space=label_space, cfg=cfg)
     print(f"saved model to {args.out}")
 
 
@@ -1,5 +1,7 @@
 import argparse
+import functools
 import json
+import math
 from pathlib import Path
 import time
 
@@ -7,107 +9,127 @@ import torch
 from torch.utils.data import DataLoader, Dataset
 from transformers import AutoTokenizer, get_linear_schedule_with_warmup
 import yaml
-import numpy as np
-from sklearn.metrics import f1_score
 
 from preprocessing import load_unified_json, build_label_space, multilabel_targets, train_val_split
-from model import CodeBERTMultiLabel
+from model import CodeBERTMultiLabel, save_checkpoint
 
 
 class ContractsDataset(Dataset):
     def __init__(self, texts, labels, tokenizer, max_length):
-        self.texts = texts
-        self.labels = labels
-        self.tokenizer = tokenizer
-        self.max_length = max_length
+        # Tokenize the whole corpus once up front instead of per item per epoch;
+        # padding is deferred to collate() so each batch pads to its own longest sample
+        enc = tokenizer(
+            list(texts),
+            max_length=max_length,
+            truncation=True,
+            padding=False,
+        )
+        self.input_ids = enc["input_ids"]
+        self.attention_mask = enc["attention_mask"]
+        self.labels = torch.as_tensor(labels, dtype=torch.float32).contiguous()
 
     def __len__(self):
-        return len(self.texts)
+        return len(self.input_ids)
 
     def __getitem__(self, idx):
-        enc = self.tokenizer(
-            self.texts[idx],
-            max_length=self.max_length,
-            truncation=True,
-            padding="max_length",
-            return_tensors="pt",
-        )
-        item = {k: v.squeeze(0) for k, v in enc.items()}
-        item["labels"] = torch.tensor(self.labels[idx], dtype=torch.float32)
-        return item
+        return {
+            "input_ids": self.input_ids[idx],
+            "attention_mask": self.attention_mask[idx],
+            "labels": self.labels[idx],
+        }
+
+
+def collate(batch, tokenizer):
+    padded = tokenizer.pad(
+        {
+            "input_ids": [b["input_ids"] for b in batch],
+            "attention_mask": [b["attention_mask"] for b in batch],
+        },
+        return_tensors="pt",
+    )
+    padded["labels"] = torch.stack([b["labels"] for b in batch])
+    return padded
 
 
-def train_epoch(model, dataloader, optimizer, scheduler, device):
+def _confusion_counts(logits, labels, threshold=0.3):
+    preds = torch.sigmoid(logits) > threshold
+    truth = labels > 0.5
+    return (preds & truth).sum(), (preds & ~truth).sum(), (~preds & truth).sum()
+
+
+def _micro_f1(tp, fp, fn):
+    # Same as sklearn's micro F1 with zero_division=0, synced to host once per epoch
+    denom = (2 * tp + fp + fn).item()
+    return (2 * tp).item() / denom if denom else 0.0
+
+
+def train_epoch(model, dataloader, optimizer, scheduler, scaler, device, grad_accum=1, f1_every=1):
     model.train()
-    total_loss = 0.0
-    all_preds = []
-    all_labels = []
+    total_loss = torch.zeros((), device=device)
+    tp = torch.zeros((), device=device)
+    fp = torch.zeros((), device=device)
+    fn = torch.zeros((), device=device)
     
     for batch_idx, batch in enumerate(dataloader):
-        input_ids = batch["input_ids"].to(device)
-        attention_mask = batch["attention_mask"].to(device)
-        labels = batch["labels"].to(device)
+        input_ids = batch["input_ids"].to(device, non_blocking=True)
+        attention_mask = batch["attention_mask"].to(device, non_blocking=True)
+        labels = batch["labels"].to(device, non_blocking=True)
         
-        optimizer.zero_grad()
-        logits = model(input_ids, attention_mask)
-        loss = model.loss_fn(logits, labels)
-        loss.backward()
+        with torch.autocast(device_type=device.type, dtype=torch.float16, enabled=device.type == "cuda"):
+            logits = model(input_ids, attention_mask)
+            loss = model.loss_fn(logits, labels)
+        scaler.scale(loss / grad_accum).backward()
         
-        # Gradient clipping
-        torch.nn.utils.clip_grad_norm_(model.parameters(), max_norm=1.0)
+        # Step once every grad_accum micro-batches (and on the last batch)
+        if (batch_idx + 1) % grad_accum == 0 or batch_idx + 1 == len(dataloader):
+            # Gradient clipping
+            scaler.unscale_(optimizer)
+            torch.nn.utils.clip_grad_norm_(model.parameters(), max_norm=1.0)
+            
+            scaler.step(optimizer)
+            scaler.update()
+            scheduler.step()
+            optimizer.zero_grad(set_to_none=True)
         
-        optimizer.step()
-        scheduler.step()
+        total_loss += loss.detach()
         
-        total_loss += loss.item()
-        
-        # Collect predictions for F1 calculation
-        with torch.no_grad():
-            probs = torch.sigmoid(logits)
-            preds = (probs > 0.3).float()
-            all_preds.append(preds.cpu().numpy())
-            all_labels.append(labels.cpu().numpy())
+        # Accumulate confusion counts on device for F1 calculation (sampled every f1_every batches)
+        if f1_every > 0 and batch_idx % f1_every == 0:
+            with torch.inference_mode():
+                batch_tp, batch_fp, batch_fn = _confusion_counts(logits, labels)
+                tp += batch_tp
+                fp += batch_fp
+                fn += batch_fn
     
-    # Calculate F1 score
-    if all_preds:
-        y_pred = np.vstack(all_preds)
-        y_true = np.vstack(all_labels)
-        f1 = f1_score(y_true, y_pred, average="micro", zero_division=0)
-        return total_loss / len(dataloader), f1
-    else:
-        return total_loss / len(dataloader), 0.0
+    f1 = _micro_f1(tp, fp, fn) if f1_every > 0 else float("nan")
+    return total_loss.item() / max(1, len(dataloader)), f1
 
 
-@torch.no_grad()
+@torch.inference_mode()
 def eval_epoch(model, dataloader, device):
     model.eval()
-    total_loss = 0.0
-    all_preds = []
-    all_labels = []
+    total_loss = torch.zeros((), device=device)
+    tp = torch.zeros((), device=device)
+    fp = torch.zeros((), device=device)
+    fn = torch.zeros((), device=device)
     
     for batch in dataloader:
-        input_ids = batch["input_ids"].to(device)
-        attention_mask = batch["attention_mask"].to(device)
-        labels = batch["labels"].to(device)
+        input_ids = batch["input_ids"].to(device, non_blocking=True)
+        attention_mask = batch["attention_mask"].to(device, non_blocking=True)
+        labels = batch["labels"].to(device, non_blocking=True)
         
-        logits = model(input_ids, attention_mask)
-        loss = model.loss_fn(logits, labels)
-        total_loss += loss.item()
+        with torch.autocast(device_type=device.type, dtype=torch.float16, enabled=device.type == "cuda"):
+            logits = model(input_ids, attention_mask)
+            loss = model.loss_fn(logits, labels)
+        total_loss += loss.detach()
         
-        # Collect predictions for F1 calculation
-        probs = torch.sigmoid(logits)
-        preds = (probs > 0.3).float()
-        all_preds.append(preds.cpu().numpy())
-        all_labels.append(labels.cpu().numpy())
+        # Accumulate confusion counts on device for F1 calculation
+        batch_tp, batch_fp, batch_fn = _confusion_counts(logits, labels)
+        tp += batch_tp
+        fp += batch_fp
+        fn += batch_fn
     
-    # Calculate F1 score
-    if all_preds:
-        y_pred = np.vstack(all_preds)
-        y_true = np.vstack(all_labels)
-        f1 = f1_score(y_true, y_pred, average="micro", zero_division=0)
-        return total_loss / len(dataloader), f1
-    else:
-        return total_loss / len(dataloader), 0.0
+    return total_loss.item() / max(1, len(dataloader)), _micro_f1(tp, fp, fn)
 
 
 def main():
@@ -120,6 +142,10 @@ def main():
     parser.add_argument("--lr", type=float, default=2e-5)
     parser.add_argument("--warmup-steps", type=int, default=100)
     parser.add_argument("--val-ratio", type=float, default=0.2)
+    parser.add_argument("--freeze-layers", type=int, default=0, help="Freeze embeddings and the first N encoder layers")
+    parser.add_argument("--grad-accum", type=int, default=1, help="Micro-batches per optimizer step")
+    parser.add_argument("--train-f1-every", type=int, default=1, help="Sample train F1 every N batches (0 disables)")
+    parser.add_argument("--workers", type=int, default=2, help="DataLoader worker processes")
     args = parser.parse_args()
 
     print(f"Starting enhanced training...")
@@ -139,40 +165,54 @@ def main():
     vuln_count = sum(1 for vulns in df["vulnerabilities"] if vulns)
     print(f"Vulnerable contracts: {vuln_count}/{len(df)}")
 
-    texts = df["source_code"].tolist()
-    labels = multilabel_targets(df["vulnerabilities"].tolist(), label_space)
+    all_labels = multilabel_targets(df["vulnerabilities"].tolist(), label_space)
 
     train_df, val_df = train_val_split(df, val_ratio=args.val_ratio)
     print(f"Train/Val split: {len(train_df)}/{len(val_df)}")
 
-    tokenizer = AutoTokenizer.from_pretrained(cfg["model_name"])
+    tokenizer = AutoTokenizer.from_pretrained(cfg["model_name"], use_fast=True)
+    if not tokenizer.is_fast:
+        raise RuntimeError(f"No fast tokenizer available for {cfg['model_name']}")
 
     train_dataset = ContractsDataset(
         train_df["source_code"].tolist(),
-        multilabel_targets(train_df["vulnerabilities"].tolist(), label_space),
+        all_labels[train_df.index.to_numpy()],
         tokenizer,
         cfg["max_length"],
     )
     val_dataset = ContractsDataset(
         val_df["source_code"].tolist(),
-        multilabel_targets(val_df["vulnerabilities"].tolist(), label_space),
+        all_labels[val_df.index.to_numpy()],
         tokenizer,
         cfg["max_length"],
     )
 
     model = CodeBERTMultiLabel(cfg["model_name"], num_labels=len(label_space))
+    model.freeze_lower_layers(args.freeze_layers)
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     model.to(device)
     print(f"Using device: {device}")
+    if torch.cuda.is_available():
+        # Batches are dynamically padded, so compile for dynamic sequence lengths
+        model = torch.compile(model, dynamic=True)
 
     # Enhanced optimizer with weight decay
-    optimizer = torch.optim.AdamW(model.parameters(), lr=args.lr, weight_decay=0.01)
+    optimizer = torch.optim.AdamW([p for p in model.parameters() if p.requires_grad], lr=args.lr, weight_decay=0.01)
+    scaler = torch.cuda.amp.GradScaler(enabled=device.type == "cuda")
     
-    train_loader = DataLoader(train_dataset, batch_size=args.batch, shuffle=True)
-    val_loader = DataLoader(val_dataset, batch_size=args.batch)
+    loader_kwargs = {
+        "batch_size": args.batch,
+        "collate_fn": functools.partial(collate, tokenizer=tokenizer),
+        "num_workers": args.workers,
+        "pin_memory": device.type == "cuda",
+    }
+    if args.workers > 0:
+        loader_kwargs.update(persistent_workers=True, prefetch_factor=4)
+    train_loader = DataLoader(train_dataset, shuffle=True, **loader_kwargs)
+    val_loader = DataLoader(val_dataset, **loader_kwargs)
 
     # Learning rate scheduler
-    total_steps = len(train_loader) * args.epochs
+    total_steps = math.ceil(len(train_loader) / args.grad_accum) * args.epochs
     scheduler = get_linear_schedule_with_warmup(
         optimizer,
         num_warmup_steps=args.warmup_steps,
@@ -195,7 +235,9 @@ def main():
     for epoch in range(args.epochs):
         start_time = time.time()
         
-        tr_loss, tr_f1 = train_epoch(model, train_loader, optimizer, scheduler, device)
+        tr_loss, tr_f1 = train_epoch(
+            model, train_loader, optimizer, scheduler, scaler, device, args.grad_accum, args.train_f1_every
+        )
         va_loss, va_f1 = eval_epoch(model, val_loader, device)
         
         epoch_time = time.time() - start_time
@@ -215,13 +257,14 @@ def main():
             patience_counter = 0
             # Save best model
             Path(args.out).parent.mkdir(parents=True, exist_ok=True)
-            torch.save({
-                "state_dict": model.state_dict(),
-                "label_space": label_space,
-                "cfg": cfg,
-                "training_history": training_history,
-                "best_f1": best_f1
-            }, args.out)
+            save_checkpoint(
+                args.out,
+                getattr(model, "_orig_mod", model),
+                label_space=label_space,
+                cfg=cfg,
+                training_history=training_history,
+                best_f1=best_f1
+            )
             print(f"  New best F1: {best_f1:.4f} - Model saved!")
         else:
             patience_counter += 1
@@ -8,18 +8,37 @@ import os
 from pathlib import Path
 from typing import List, Dict, Any
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 class ManualContractAdder:
-    def __init__(self, output_file: str = "datasets/raw/manual_vulnerable_contracts.json"):
+    def __init__(self, output_file: str = "datasets/raw/manual_vulnerable_contracts.jsonl"):
         self.output_file = Path(output_file)
         self.output_file.parent.mkdir(parents=True, exist_ok=True)
+        # JSON array export read by merge_all_datasets.py
+        self.export_file = self.output_file.with_suffix(".json")
         
-        # Load existing contracts if file exists
+        # Load existing contracts (one JSON object per line)
+        self.contracts = []
         if self.output_file.exists():
             with open(self.output_file, 'r', encoding='utf-8') as f:
-                self.contracts = json.load(f)
-        else:
-            self.contracts = []
+                for line in f:
+                    if line.strip():
+                        self.contracts.append(json.loads(line))
+        elif self.export_file.exists():
+            # Migrate a legacy JSON array file to JSON Lines
+            with open(self.export_file, 'r', encoding='utf-8') as f:
+                for contract in json.load(f):
+                    self._append_contract(contract)
+        
+        # Only re-export the JSON array when it is missing or older than hand edits to the JSON Lines file
+        self._dirty = not self.export_file.exists() or (
+            self.output_file.exists()
+            and self.output_file.stat().st_mtime_ns > self.export_file.stat().st_mtime_ns
+        )
         
         # Available vulnerability types
         self.vulnerability_types = [
@@ -35,6 +54,10 @@ class ManualContractAdder:
         ]
         
         self.severity_levels = ["critical", "high", "medium", "low"]
+        
+        # Menu number -> value lookups for interactive input
+        self._vuln_index = {str(i): v for i, v in enumerate(self.vulnerability_types, 1)}
+        self._severity_index = {str(i): s for i, s in enumerate(self.severity_levels, 1)}
 
     def add_contract_interactive(self):
         """Interactively add a new contract"""
@@ -69,12 +92,11 @@ class ManualContractAdder:
         vulnerabilities = []
         
         if vuln_input:
-            try:
-                vuln_indices = [int(x.strip()) - 1 for x in vuln_input.split(',')]
-                vulnerabilities = [self.vulnerability_types[i] for i in vuln_indices if 0 <= i < len(self.vulnerability_types)]
-            except (ValueError, IndexError):
+            tokens = [x.strip() for x in vuln_input.split(',')]
+            if not all(t.isdigit() for t in tokens):
                 print("Invalid input. Please enter numbers separated by commas.")
                 return
+            vulnerabilities = [self._vuln_index[t] for t in tokens if t in self._vuln_index]
         
         # Get severity
         print(f"\nAvailable severity levels:")
@@ -82,12 +104,7 @@ class ManualContractAdder:
             print(f"{i}. {severity}")
         
         severity_input = input("Enter severity number (1-4): ").strip()
-        severity = ["high"]  # default
-        
-        if severity_input.isdigit():
-            severity_idx = int(severity_input) - 1
-            if 0 <= severity_idx < len(self.severity_levels):
-                severity = [self.severity_levels[severity_idx]]
+        severity = [self._severity_index.get(severity_input, "high")]  # default high
         
         # Get source
         source = input("Source (e.g., 'rekt_news', 'immunefi'): ").strip() or "manual"
@@ -116,19 +133,37 @@ class ManualContractAdder:
         if description:
             contract["description"] = description
         
-        # Add to list
-        self.contracts.append(contract)
+        # Append to the JSON Lines file
+        self._append_contract(contract)
         
         print(f"\n✅ Added contract: {contract_id}")
         print(f"   Vulnerabilities: {', '.join(vulnerabilities)}")
         print(f"   Severity: {', '.join(severity)}")
         print(f"   Source: {source}")
 
+    def _append_contract(self, contract: Dict[str, Any]):
+        """Append a single contract as one JSON line"""
+        with open(self.output_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(contract, ensure_ascii=False) + '\n')
+        self.contracts.append(contract)
+        self._dirty = True
+
+    def export_json_array(self):
+        """Export all contracts as a JSON array for downstream consumers"""
+        if orjson is not None:
+            self.export_file.write_bytes(orjson.dumps(self.contracts, option=orjson.OPT_INDENT_2))
+        else:
+            with open(self.export_file, 'w', encoding='utf-8') as f:
+                json.dump(self.contracts, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Exported {len(self.contracts)} contracts to {self.export_file}")
+
     def save_contracts(self):
-        """Save contracts to file"""
-        with open(self.output_file, 'w', encoding='utf-8') as f:
-            json.dump(self.contracts, f, indent=2, ensure_ascii=False)
-        print(f"\n💾 Saved {len(self.contracts)} contracts to {self.output_file}")
+        """Contracts are appended as they are added; refresh the JSON array export if changed"""
+        if not self._dirty:
+            print("\n💾 No changes since last save")
+            return
+        self.export_json_array()
+        self._dirty = False
 
     def list_contracts(self):
         """List all contracts"""
@@ -4,14 +4,192 @@ Dataset aggregation script for SecuRizz ML training data.
 Combines SmartBugs, SWC registry, and SolidiFI datasets into unified format.
 """
 
+import asyncio
 import json
 import os
 import requests
+import shutil
+import tempfile
 import zipfile
+from collections import Counter
+from functools import lru_cache
+from itertools import chain, islice
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 import hashlib
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+def write_json(path: Path, data: Any) -> None:
+    """Write data as indented JSON, using orjson when available"""
+    if orjson is not None:
+        Path(path).write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+def iter_files(root: str, suffix: str) -> Iterator[str]:
+    """Recursively yield file paths ending in suffix, using d_type from os.scandir"""
+    try:
+        entries = os.scandir(root)
+    except OSError:
+        return
+    with entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_files(entry.path, suffix)
+            elif entry.name.endswith(suffix) and entry.is_file():
+                yield entry.path
+
+
+def write_jsonl(f, contracts: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Write each contract as one JSON line to binary file f, passing it through"""
+    for contract in contracts:
+        if orjson is not None:
+            f.write(orjson.dumps(contract) + b"\n")
+        else:
+            f.write((json.dumps(contract, ensure_ascii=False) + "\n").encode("utf-8"))
+        yield contract
+
+
+PARQUET_ROW_GROUP_SIZE = 1024
+
+
+def write_parquet(path: Path, contracts: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Write contracts to a zstd Parquet file in row groups, passing each one through"""
+    schema = pa.schema([
+        ("contract_id", pa.string()),
+        ("source_code", pa.string()),
+        ("vulnerabilities", pa.list_(pa.string())),
+        ("severity", pa.list_(pa.string())),
+        ("source", pa.string()),
+        ("file_path", pa.string()),
+    ])
+    columns = {name: [] for name in schema.names}
+    
+    with pq.ParquetWriter(str(path), schema, compression="zstd", use_dictionary=True) as writer:
+        def flush():
+            writer.write_table(pa.table(columns, schema=schema))
+            for values in columns.values():
+                values.clear()
+        
+        for contract in contracts:
+            for name, values in columns.items():
+                values.append(contract.get(name))
+            if len(columns["contract_id"]) >= PARQUET_ROW_GROUP_SIZE:
+                flush()
+            yield contract
+        if columns["contract_id"]:
+            flush()
+
+
+def short_digest(text: str) -> str:
+    """Fast 64-bit hex digest for contract ids (xxh3, or blake2b without xxhash)"""
+    if xxhash is not None:
+        return xxhash.xxh3_64_hexdigest(text)
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+def split_template(template: str) -> List[str]:
+    """Pre-split a str.format template on {id} so rendering is a plain join"""
+    return [part.replace("{{", "{").replace("}}", "}") for part in template.split("{id}")]
+
+
+def build_vulnerability_automaton(vulnerability_mapping: Dict[str, str]):
+    """Build an Aho-Corasick automaton over the mapping keywords, or None without pyahocorasick"""
+    if ahocorasick is None:
+        return None
+    return _cached_automaton(tuple(vulnerability_mapping.items()))
+
+
+@lru_cache(maxsize=None)
+def _cached_automaton(mapping_items: Tuple[Tuple[str, str], ...]):
+    # Shared by every aggregator (and retry) built from the same mapping
+    automaton = ahocorasick.Automaton()
+    for priority, (keyword, vulnerability) in enumerate(mapping_items):
+        automaton.add_word(keyword.lower(), (priority, vulnerability))
+    automaton.make_automaton()
+    return automaton
+
+
+def match_vulnerability(text: str, vulnerability_mapping: Dict[str, str], automaton=None) -> Optional[str]:
+    """Return the first mapping keyword (in mapping order) found in lowercased text"""
+    if automaton is not None:
+        # Single pass over the text; keep mapping order as the tie-break
+        hit = min((value for _, value in automaton.iter(text)), default=None)
+        return hit[1] if hit else None
+    for vuln_type, vulnerability in vulnerability_mapping.items():
+        if vuln_type in text:
+            return vulnerability
+    return None
+
+
+MAX_SOL_FILE_BYTES = 1024 * 1024
+SOL_READ_CONCURRENCY = 64
+
+
+def label_sol_file(sol_file: str, vulnerability_mapping: Dict[str, str], automaton=None) -> Optional[str]:
+    """Label a SmartBugs .sol file from its path alone, or return None to skip it"""
+    # SmartBugs lays files out as dataset/<vuln>/<file>.sol; try the parent dir first
+    parent_dir = os.path.basename(os.path.dirname(sol_file)).lower()
+    vulnerability = vulnerability_mapping.get(parent_dir)
+    if vulnerability is None:
+        vulnerability = match_vulnerability(sol_file.lower(), vulnerability_mapping, automaton)
+    if vulnerability is None:
+        return None
+    
+    # Skip giant generated contracts
+    if os.path.getsize(sol_file) > MAX_SOL_FILE_BYTES:
+        return None
+    return vulnerability
+
+
+def smartbugs_contract(sol_file: str, source_code: str, vulnerability: str) -> Dict[str, Any]:
+    return {
+        "contract_id": f"smartbugs_{short_digest(sol_file)}",
+        "source_code": source_code,
+        "vulnerabilities": [vulnerability],
+        "severity": ["high"],  # SmartBugs typically contains high-severity vulns
+        "source": "smartbugs",
+        "file_path": sol_file
+    }
+
+
+def _read_sol_file(path: str) -> Optional[str]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except Exception as e:
+        print(f"Error processing {path}: {e}")
+        return None
+
+
+async def read_sol_files(paths: List[str]) -> List[Optional[str]]:
+    """Read a batch of files concurrently off the event loop; unreadable files come back as None"""
+    return await asyncio.gather(*(asyncio.to_thread(_read_sol_file, path) for path in paths))
+
 
 class DatasetAggregator:
     def __init__(self, output_dir: str = "datasets"):
@@ -41,70 +219,73 @@ class DatasetAggregator:
             "unsafe_selfdestruct": "unsafe_selfdestruct",
             "missing_pausing": "missing_pausing",
         }
+        self.vulnerability_automaton = build_vulnerability_automaton(self.vulnerability_mapping)
 
     def download_smartbugs(self) -> str:
         """Download SmartBugs dataset"""
         print("Downloading SmartBugs dataset...")
         url = "https://github.com/smartbugs/smartbugs/archive/refs/heads/master.zip"
-        zip_path = self.raw_dir / "smartbugs.zip"
+        # GitHub archives extract to <repo>-<branch>/
+        extract_dir = self.raw_dir / "smartbugs-master"
         
-        if not zip_path.exists():
-            response = requests.get(url, stream=True)
-            response.raise_for_status()
-            
-            with open(zip_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-        
-        # Extract
-        extract_dir = self.raw_dir / "smartbugs"
         if not extract_dir.exists():
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(self.raw_dir)
+            # Extract straight from the download buffer; no intermediate zip on disk
+            with requests.get(url, stream=True) as response:
+                response.raise_for_status()
+                response.raw.decode_content = True
+                with tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024) as buf:
+                    shutil.copyfileobj(response.raw, buf, length=1024 * 1024)
+                    buf.seek(0)
+                    with zipfile.ZipFile(buf) as zip_ref:
+                        zip_ref.extractall(self.raw_dir)
         
         return str(extract_dir)
 
-    def process_smartbugs(self, smartbugs_dir: str) -> List[Dict[str, Any]]:
-        """Process SmartBugs dataset"""
+    def process_smartbugs(self, smartbugs_dir: str) -> Iterator[Dict[str, Any]]:
+        """Process SmartBugs dataset, yielding contracts as they are classified"""
         print("Processing SmartBugs dataset...")
-        contracts = []
-        smartbugs_path = Path(smartbugs_dir)
+        count = 0
+        
+        labeled = self._label_sol_files(iter_files(smartbugs_dir, ".sol"))
         
-        # Find all .sol files
-        for sol_file in smartbugs_path.rglob("*.sol"):
+        # Labelling is path-only; read the matches a bounded batch at a time and yield
+        # each batch before reading the next, so sources never pile up in memory
+        loop = asyncio.new_event_loop()
+        try:
+            while batch := list(islice(labeled, SOL_READ_CONCURRENCY)):
+                sources = loop.run_until_complete(read_sol_files([sol_file for sol_file, _ in batch]))
+                for (sol_file, vulnerability), source_code in zip(batch, sources):
+                    if source_code is not None:
+                        count += 1
+                        yield smartbugs_contract(sol_file, source_code, vulnerability)
+        finally:
+            loop.close()
+        
+        print(f"Processed {count} SmartBugs contracts")
+
+    def _label_sol_files(self, paths: Iterable[str]) -> Iterator[Tuple[str, str]]:
+        """Yield (path, vulnerability) for each SmartBugs file that gets a label"""
+        for sol_file in paths:
             try:
-                with open(sol_file, 'r', encoding='utf-8') as f:
-                    source_code = f.read()
-                
-                # Extract vulnerability from directory structure
-                vulnerability = None
-                for vuln_type in self.vulnerability_mapping.keys():
-                    if vuln_type in str(sol_file).lower():
-                        vulnerability = self.vulnerability_mapping[vuln_type]
-                        break
-                
-                if vulnerability:
-                    contract = {
-                        "contract_id": f"smartbugs_{hashlib.md5(str(sol_file).encode()).hexdigest()}",
-                        "source_code": source_code,
-                        "vulnerabilities": [vulnerability],
-                        "severity": ["high"],  # SmartBugs typically contains high-severity vulns
-                        "source": "smartbugs",
-                        "file_path": str(sol_file)
-                    }
-                    contracts.append(contract)
-                    
-            except Exception as e:
+                vulnerability = label_sol_file(sol_file, self.vulnerability_mapping, self.vulnerability_automaton)
+            except OSError as e:
                 print(f"Error processing {sol_file}: {e}")
                 continue
-        
-        print(f"Processed {len(contracts)} SmartBugs contracts")
-        return contracts
+            if vulnerability is not None:
+                yield sol_file, vulnerability
+
+    def smartbugs_contracts(self) -> Iterator[Dict[str, Any]]:
+        """Download and process SmartBugs; a failure ends the stream and aggregation carries on"""
+        try:
+            smartbugs_dir = self.download_smartbugs()
+            yield from self.process_smartbugs(smartbugs_dir)
+        except Exception as e:
+            print(f"SmartBugs processing failed: {e}")
+            print("Continuing with mock data...")
 
-    def create_mock_safe_contracts(self, count: int = 100) -> List[Dict[str, Any]]:
+    def create_mock_safe_contracts(self, count: int = 100) -> Iterator[Dict[str, Any]]:
         """Create mock safe contracts for balanced dataset"""
         print(f"Creating {count} mock safe contracts...")
-        contracts = []
         
         safe_contract_template = '''
 pragma solidity ^0.8.0;
@@ -158,23 +339,20 @@ contract SafeContract{id} is ReentrancyGuard, Ownable {{
 }}
 '''
         
+        safe_parts = split_template(safe_contract_template)
         for i in range(count):
-            contract = {
+            yield {
                 "contract_id": f"safe_contract_{i:03d}",
-                "source_code": safe_contract_template.format(id=i),
+                "source_code": str(i).join(safe_parts),
                 "vulnerabilities": [],  # No vulnerabilities
                 "severity": [],  # No severity
                 "source": "mock_safe",
                 "file_path": f"mock_safe_contract_{i:03d}.sol"
             }
-            contracts.append(contract)
-        
-        return contracts
 
-    def create_mock_vulnerable_contracts(self, count: int = 50) -> List[Dict[str, Any]]:
+    def create_mock_vulnerable_contracts(self, count: int = 50) -> Iterator[Dict[str, Any]]:
         """Create mock vulnerable contracts for testing"""
         print(f"Creating {count} mock vulnerable contracts...")
-        contracts = []
         
         vulnerable_templates = [
             {
@@ -252,85 +430,86 @@ contract VulnerableTxOrigin{id} {{
             }
         ]
         
+        template_parts = [split_template(t["template"]) for t in vulnerable_templates]
+        
         for i in range(count):
             template = vulnerable_templates[i % len(vulnerable_templates)]
-            contract = {
+            yield {
                 "contract_id": f"vulnerable_{template['vulnerability']}_{i:03d}",
-                "source_code": template["template"].format(id=i),
+                "source_code": str(i).join(template_parts[i % len(vulnerable_templates)]),
                 "vulnerabilities": [template["vulnerability"]],
                 "severity": ["high"],
                 "source": "mock_vulnerable",
                 "file_path": f"mock_vulnerable_{template['vulnerability']}_{i:03d}.sol"
             }
-            contracts.append(contract)
-        
-        return contracts
 
     def aggregate_all(self) -> str:
-        """Aggregate all datasets into unified format"""
+        """Aggregate all datasets into unified format, streamed to JSON Lines"""
         print("Starting dataset aggregation...")
         
-        all_contracts = []
-        
-        # Process SmartBugs (if available)
-        try:
-            smartbugs_dir = self.download_smartbugs()
-            smartbugs_contracts = self.process_smartbugs(smartbugs_dir)
-            all_contracts.extend(smartbugs_contracts)
-        except Exception as e:
-            print(f"SmartBugs processing failed: {e}")
-            print("Continuing with mock data...")
-        
-        # Add mock safe contracts
-        safe_contracts = self.create_mock_safe_contracts(100)
-        all_contracts.extend(safe_contracts)
+        # SmartBugs (if available) is consumed lazily, so its errors are handled inside the stream
+        sources = [
+            self.smartbugs_contracts(),
+            self.create_mock_safe_contracts(100),
+            self.create_mock_vulnerable_contracts(50),
+        ]
         
-        # Add mock vulnerable contracts
-        vulnerable_contracts = self.create_mock_vulnerable_contracts(50)
-        all_contracts.extend(vulnerable_contracts)
+        # Save unified dataset one contract per line and gather statistics on the same pass;
+        # outputs are written beside their targets and swapped in only once complete
+        output_file = self.processed_dir / "unified_dataset.jsonl"
+        parquet_file = self.processed_dir / "unified_dataset.parquet"
+        outputs = [output_file, parquet_file] if pa is not None else [output_file]
+        tmp_files = {path: path.with_name(path.name + ".tmp") for path in outputs}
         
-        # Save unified dataset
-        output_file = self.processed_dir / "unified_dataset.json"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(all_contracts, f, indent=2, ensure_ascii=False)
+        contracts = chain.from_iterable(sources)
+        if pa is not None:
+            # Columnar copy for training; the JSON Lines file stays for inspection
+            contracts = write_parquet(tmp_files[parquet_file], contracts)
+        try:
+            with open(tmp_files[output_file], 'wb') as f:
+                stats = self.generate_statistics(write_jsonl(f, contracts))
+        except BaseException:
+            if pa is not None:
+                contracts.close()  # Closes the Parquet writer before its file is removed
+            for tmp_file in tmp_files.values():
+                tmp_file.unlink(missing_ok=True)
+            raise
+        for path, tmp_file in tmp_files.items():
+            os.replace(tmp_file, path)
         
-        # Generate statistics
-        stats = self.generate_statistics(all_contracts)
         stats_file = self.processed_dir / "dataset_statistics.json"
-        with open(stats_file, 'w', encoding='utf-8') as f:
-            json.dump(stats, f, indent=2, ensure_ascii=False)
+        write_json(stats_file, stats)
         
         print(f"Dataset aggregation complete!")
-        print(f"Total contracts: {len(all_contracts)}")
+        print(f"Total contracts: {stats['total_contracts']}")
         print(f"Output file: {output_file}")
+        if pa is not None:
+            print(f"Parquet file: {parquet_file}")
         print(f"Statistics: {stats_file}")
         
         return str(output_file)
 
-    def generate_statistics(self, contracts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def generate_statistics(self, contracts: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
         """Generate dataset statistics"""
-        total_contracts = len(contracts)
-        vulnerable_contracts = sum(1 for c in contracts if c["vulnerabilities"])
-        safe_contracts = total_contracts - vulnerable_contracts
-        
-        # Count by vulnerability type
-        vuln_counts = {}
-        for contract in contracts:
-            for vuln in contract["vulnerabilities"]:
-                vuln_counts[vuln] = vuln_counts.get(vuln, 0) + 1
+        total_contracts = 0
+        vulnerable_contracts = 0
+        vuln_counts = Counter()
+        source_counts = Counter()
         
-        # Count by source
-        source_counts = {}
+        # Count by vulnerability type and source in one pass
         for contract in contracts:
-            source = contract["source"]
-            source_counts[source] = source_counts.get(source, 0) + 1
+            total_contracts += 1
+            if contract["vulnerabilities"]:
+                vulnerable_contracts += 1
+            vuln_counts.update(contract["vulnerabilities"])
+            source_counts[contract["source"]] += 1
         
         return {
             "total_contracts": total_contracts,
             "vulnerable_contracts": vulnerable_contracts,
-            "safe_contracts": safe_contracts,
-            "vulnerability_distribution": vuln_counts,
-            "source_distribution": source_counts,
+            "safe_contracts": total_contracts - vulnerable_contracts,
+            "vulnerability_distribution": dict(vuln_counts),
+            "source_distribution": dict(source_counts),
             "vulnerability_types": list(self.vulnerability_mapping.values())
         }
 
@@ -4,21 +4,303 @@ Dataset aggregation script for SecuRizz ML training data - RUST/SOLANA FOCUS.
 Combines Rust vulnerability datasets for Solana smart contract security.
 """
 
+import importlib.util
 import json
 import os
 import requests
 import zipfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import chain, islice
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 import hashlib
 import re
-from huggingface_hub import snapshot_download
+import shelve
+import threading
+import time
+
+# huggingface_hub reads these at import time; hf_transfer must be installed to enable it
+if importlib.util.find_spec("hf_transfer") is not None:
+    os.environ.setdefault("HF_HUB_ENABLE_HF_TRANSFER", "1")
+os.environ.setdefault("HF_XET_HIGH_PERFORMANCE", "1")
+
+from huggingface_hub import HfApi, hf_hub_download
 from github import Github
-import pandas as pd
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+def compile_pattern(pattern: str, flags: int = re.IGNORECASE):
+    """Compile with RE2 (linear time on untrusted input) when available, else stdlib re"""
+    if re2 is not None:
+        inline = ("i" if flags & re.IGNORECASE else "") + ("s" if flags & re.DOTALL else "")
+        try:
+            return re2.compile(f"(?{inline}){pattern}" if inline else pattern)
+        except Exception:
+            pass  # Construct RE2 does not support; fall back to backtracking re
+    return re.compile(pattern, flags)
+
+
+# Code patterns for pattern-based vulnerability detection, matched case-sensitively against lowercased
+# code; the capitalised entries (AccountInfo, PDA) therefore never fire, as in the original detector
+CODE_PATTERNS = {
+    "unsafe_code": [r"unsafe\s*\{", r"std::ptr::", r"transmute"],
+    "account_validation": [r"#\[account\(\)\]", r"AccountInfo", r"require!.*account"],
+    "signature_verification": [r"is_signer", r"require!.*signer", r"msg\.sender"],
+    "integer_overflow": [r"\.wrapping_add", r"\.wrapping_sub", r"checked_add", r"checked_sub"],
+    "panic_handling": [r"panic!", r"unwrap\(\)", r"expect\(", r"unreachable!"],
+    "program_derivation": [r"find_program_address", r"create_program_address", r"try_find_program_address"],
+    "seed_validation": [r"seeds.*b\"", r"PDA", r"program_derived_address"],
+    "authority_validation": [r"authority", r"owner", r"admin", r"only_owner"],
+    "instruction_validation": [r"instruction", r"cpi", r"invoke", r"invoke_signed"],
+    "data_validation": [r"deserialize", r"serialize", r"borsh", r"anchor_lang"],
+    "rent_exemption": [r"rent", r"lamports", r"minimum_balance", r"rent_exempt"],
+    "token_program": [r"token_program", r"spl_token", r"transfer", r"mint"],
+    "cross_program_invocation": [r"invoke", r"invoke_signed", r"cpi", r"cross_program"],
+    "pda_validation": [r"program_derived_address", r"find_program_address", r"seeds"]
+}
+
+# Vulnerability hints in instruction-following response text, matched case-insensitively
+TEXT_PATTERNS = {
+    "unsafe_code": [r"unsafe", r"unsafe\s*\{", r"transmute", r"std::ptr"],
+    "account_validation": [r"account.*validation", r"missing.*account", r"account.*check"],
+    "signature_verification": [r"signature", r"signer", r"authority", r"permission"],
+    "integer_overflow": [r"overflow", r"underflow", r"arithmetic", r"wrapping"],
+    "panic_handling": [r"panic", r"unwrap", r"expect", r"unreachable"],
+    "program_derivation": [r"program.*derivation", r"pda", r"program.*address"],
+    "seed_validation": [r"seed", r"seeds", r"program.*derived"],
+    "authority_validation": [r"authority", r"owner", r"admin", r"permission"],
+    "instruction_validation": [r"instruction", r"cpi", r"invoke"],
+    "data_validation": [r"data.*validation", r"deserialize", r"serialize"],
+    "rent_exemption": [r"rent", r"lamports", r"exemption"],
+    "token_program": [r"token", r"spl", r"transfer", r"mint"],
+    "cross_program_invocation": [r"cpi", r"invoke", r"cross.*program"],
+    "pda_validation": [r"pda", r"program.*derived.*address", r"seeds"]
+}
+
+# Compiled once into immutable (vuln_type, patterns) pairs that worker processes inherit
+COMPILED_CODE_PATTERNS: Tuple[Tuple[str, Tuple[Any, ...]], ...] = tuple(
+    (vuln_type, tuple(compile_pattern(p, 0) for p in patterns)) for vuln_type, patterns in CODE_PATTERNS.items()
+)
+COMPILED_TEXT_PATTERNS: Tuple[Tuple[str, Tuple[Any, ...]], ...] = tuple(
+    (vuln_type, tuple(compile_pattern(p) for p in patterns)) for vuln_type, patterns in TEXT_PATTERNS.items()
+)
+CODE_VULNERABILITY_ORDER = tuple(CODE_PATTERNS)
+RUST_CODE_BLOCK_RE = compile_pattern(r'```(?:rust)?\s*(.*?)```', re.DOTALL)
+VULNERABILITY_INDICATOR_RE = compile_pattern(
+    r"vulnerab(?:le|ility)|exploit|attack|unsafe|security issue|bug|flaw|weakness|risk"
+)
+
+_REGEX_METACHARS = frozenset(".^$*+?{}[]|()")
+
+
+def pattern_literal(pattern: str) -> Optional[str]:
+    """Return the plain string a regex matches if it has no metacharacters, else None"""
+    chars = []
+    escaped = False
+    for ch in pattern:
+        if escaped:
+            # \s, \d, \b etc. are classes/assertions, not literals
+            if ch.isalnum():
+                return None
+            chars.append(ch)
+            escaped = False
+        elif ch == "\\":
+            escaped = True
+        elif ch in _REGEX_METACHARS:
+            return None
+        else:
+            chars.append(ch)
+    return None if escaped else "".join(chars)
+
+
+def build_code_scanner():
+    """Split CODE_PATTERNS into an Aho-Corasick automaton of literals plus residual regexes"""
+    if ahocorasick is None:
+        return None, COMPILED_CODE_PATTERNS
+    
+    literal_vulns: Dict[str, List[str]] = {}
+    residual: Dict[str, List[Any]] = {}
+    for vuln_type, patterns in CODE_PATTERNS.items():
+        for pattern in patterns:
+            literal = pattern_literal(pattern)
+            if literal is None:
+                residual.setdefault(vuln_type, []).append(compile_pattern(pattern, 0))
+            else:
+                literal_vulns.setdefault(literal, []).append(vuln_type)
+    
+    automaton = ahocorasick.Automaton()
+    for literal, vuln_types in literal_vulns.items():
+        automaton.add_word(literal, tuple(vuln_types))
+    automaton.make_automaton()
+    return automaton, tuple((vuln_type, tuple(patterns)) for vuln_type, patterns in residual.items())
+
+
+CODE_AUTOMATON, RESIDUAL_CODE_PATTERNS = build_code_scanner()
+
+HF_DATASET_REPO = "FraChiacc99/solana-vuln-rust"
+GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
+
+# Hugging Face records handed to the parser pool at a time
+PARSE_BATCH_SIZE = 4096
+
+
+def detect_vulnerabilities_in_code(code: str) -> List[str]:
+    """Detect vulnerabilities in Rust code using pattern matching"""
+    hits = set()
+    code_lower = code.lower()
+    
+    # One pass for every literal pattern, then only the real regexes
+    if CODE_AUTOMATON is not None:
+        for _, vuln_types in CODE_AUTOMATON.iter(code_lower):
+            hits.update(vuln_types)
+    for vuln_type, pattern_list in RESIDUAL_CODE_PATTERNS:
+        if vuln_type not in hits and any(pattern.search(code_lower) for pattern in pattern_list):
+            hits.add(vuln_type)
+    
+    return [vuln_type for vuln_type in CODE_VULNERABILITY_ORDER if vuln_type in hits]
+
+
+def parse_instruction_text(text: str) -> Dict[str, Any]:
+    """Parse instruction-following text to extract Rust code and vulnerability info"""
+    source_code = ""
+    vulnerabilities = []
+    severity = ["medium"]
+    
+    # Extract Rust code from the first markdown code block
+    rust_match = RUST_CODE_BLOCK_RE.search(text)
+    
+    if rust_match:
+        source_code = rust_match.group(1).strip()
+    
+    # Determine if vulnerable based on vulnerability indicators in the response
+    if VULNERABILITY_INDICATOR_RE.search(text):
+        # Extract specific vulnerability types from the text (each key is visited once)
+        vulnerabilities = [
+            vuln_type for vuln_type, patterns in COMPILED_TEXT_PATTERNS
+            if any(pattern.search(text) for pattern in patterns)
+        ]
+    
+        # If no specific vulnerabilities found, add generic ones
+        if not vulnerabilities:
+            vulnerabilities = ["unsafe_code", "account_validation"]
+            severity = ["high"]
+    else:
+        # No vulnerabilities detected
+        vulnerabilities = []
+        severity = []
+    
+    return {
+        "source_code": source_code,
+        "vulnerabilities": vulnerabilities,
+        "severity": severity
+    }
+
+
+def source_digest(text: str) -> bytes:
+    """Fast content digest for duplicate detection (blake3, or blake2b without it)"""
+    if blake3 is not None:
+        return blake3.blake3(text.encode()).digest()
+    return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+
+def split_template(template: str) -> List[str]:
+    """Pre-split a str.format template on {id} so rendering is a plain join"""
+    return [part.replace("{{", "{").replace("}}", "}") for part in template.split("{id}")]
+
+
+def write_json(path: Path, data: Any) -> None:
+    """Write data as indented JSON, using orjson when available"""
+    if orjson is not None:
+        Path(path).write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+def write_jsonl(f, contracts: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Write each contract as one JSON line to binary file f, passing it through"""
+    for contract in contracts:
+        if orjson is not None:
+            f.write(orjson.dumps(contract) + b"\n")
+        else:
+            f.write((json.dumps(contract, ensure_ascii=False) + "\n").encode("utf-8"))
+        yield contract
+
+
+PARQUET_ROW_GROUP_SIZE = 4096
+
+
+def write_parquet(path: Path, contracts: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Write contracts to a zstd Parquet file in row groups, passing each one through"""
+    schema = pa.schema([
+        ("contract_id", pa.string()),
+        ("source_code", pa.string()),
+        ("vulnerabilities", pa.list_(pa.string())),
+        ("severity", pa.list_(pa.string())),
+        ("source", pa.string()),
+        ("file_path", pa.string()),
+    ])
+    columns = {name: [] for name in schema.names}
+    
+    with pq.ParquetWriter(str(path), schema, compression="zstd", compression_level=3) as writer:
+        def flush():
+            writer.write_table(pa.table(columns, schema=schema))
+            for values in columns.values():
+                values.clear()
+        
+        for contract in contracts:
+            for name, values in columns.items():
+                values.append(contract.get(name))
+            if len(columns["contract_id"]) >= PARQUET_ROW_GROUP_SIZE:
+                flush()
+            yield contract
+        if columns["contract_id"]:
+            flush()
+
+
+def stream_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    """Yield one record per JSONL line, skipping blank and malformed lines"""
+    loads = orjson.loads if orjson is not None else json.loads
+    with open(path, 'rb') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield loads(line)
+            except ValueError as e:
+                print(f"Skipping malformed line {line_no} in {path.name}: {e}")
 
 
 class RustDatasetAggregator:
-    def __init__(self, output_dir: str = "datasets", github_token: str = None):
+    def __init__(self, output_dir: str = "datasets", github_token: str = None, github_cache_ttl: int = 24 * 3600):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
         self.raw_dir = self.output_dir / "raw"
@@ -27,8 +309,19 @@ class RustDatasetAggregator:
         self.processed_dir.mkdir(exist_ok=True)
         
         # Initialize GitHub client if token provided
+        self.github_token = github_token
         self.github = Github(github_token) if github_token else None
         
+        # Search results plus file contents, keyed by (repo, query); 0 disables reuse
+        self.github_cache_file = self.raw_dir / "github_search_cache"
+        self.github_cache_ttl = github_cache_ttl
+        self._cache_lock = threading.Lock()  # repositories are fetched concurrently
+        
+        # Digests of downloaded sources already emitted; vendored copies are skipped
+        self._seen_sources = set()
+        # Digests of Hugging Face texts already parsed; a repeat can only yield a duplicate
+        self._seen_texts = set()
+        
         # Rust/Solana vulnerability type mapping
         self.vulnerability_mapping = {
             # Rust-specific vulnerabilities
@@ -66,74 +359,84 @@ class RustDatasetAggregator:
             "pda_validation": "pda_validation"
         }
 
-    def download_huggingface_solana_dataset(self) -> List[Dict[str, Any]]:
-        """Download Solana vulnerability dataset from Hugging Face"""
+    def download_huggingface_solana_dataset(self) -> Iterator[Dict[str, Any]]:
+        """Download Solana vulnerability dataset from Hugging Face, yielding parsed contracts"""
         print("Downloading Solana vulnerability dataset from Hugging Face...")
-        contracts = []
+        count = 0
         
         try:
-            # Download the dataset
-            dataset_path = snapshot_download(
-                repo_id="FraChiacc99/solana-vuln-rust",
-                repo_type="dataset"
-            )
+            # Look for data files (JSON, JSONL, and Parquet when pyarrow is installed)
+            repo_files = HfApi().list_repo_files(HF_DATASET_REPO, repo_type="dataset")
+            data_files = ([f for f in repo_files if "/" not in f and f.endswith(".json")] +
+                          [f for f in repo_files if "/" not in f and f.endswith(".jsonl")])
+            parquet_files = [f for f in repo_files if f.startswith("data/") and f.count("/") == 1 and f.endswith(".parquet")]
+            if pq is not None:
+                data_files += parquet_files
+            elif parquet_files:
+                print(f"pyarrow not installed, skipping {len(parquet_files)} Parquet data files")
             
-            # Look for data files (JSON, JSONL, and Parquet)
-            dataset_dir = Path(dataset_path)
-            data_files = (list(dataset_dir.glob("*.json")) + 
-                         list(dataset_dir.glob("*.jsonl")) + 
-                         list(dataset_dir.glob("data/*.parquet")))
-            
-            for data_file in data_files:
-                print(f"Processing {data_file.name}...")
-                
-                if data_file.suffix == '.parquet':
-                    # Handle Parquet files
-                    df = pd.read_parquet(data_file)
-                    data = df.to_dict('records')
-                else:
-                    # Handle JSON/JSONL files
-                    with open(data_file, 'r', encoding='utf-8') as f:
-                        if data_file.suffix == '.jsonl':
-                            data = [json.loads(line) for line in f]
-                        else:
-                            data = json.load(f)
+            # Download files in the background and parse each one as soon as it lands;
+            # parsing is pure regex work, so spread it across processes in record batches
+            with ThreadPoolExecutor(max_workers=8) as downloader, ProcessPoolExecutor() as executor:
+                downloads = [
+                    downloader.submit(hf_hub_download, repo_id=HF_DATASET_REPO, filename=f, repo_type="dataset")
+                    for f in data_files
+                ]
                 
-                for i, record in enumerate(data):
-                    # Extract text content
-                    text_content = record.get('text', '')
+                for download in downloads:
+                    data_file = Path(download.result())
+                    print(f"Processing {data_file.name}...")
                     
-                    if text_content:
+                    records = enumerate(self._iter_records(data_file))
+                    for batch in iter(lambda: list(islice(records, PARSE_BATCH_SIZE)), []):
+                        # Extract text content
+                        texts = [(i, record.get('text', '')) for i, record in batch]
+                        texts = [(i, text) for i, text in texts if text and self._first_seen(text, self._seen_texts)]
+                        
                         # Parse instruction-following format to extract Rust code and vulnerability info
-                        parsed_data = self._parse_instruction_text(text_content)
+                        parsed = executor.map(parse_instruction_text, [text for _, text in texts], chunksize=32)
                         
-                        if parsed_data['source_code'] and parsed_data['vulnerabilities']:
-                            contract = {
-                                "contract_id": f"hf_solana_{i:06d}",
-                                "source_code": parsed_data['source_code'],
-                                "vulnerabilities": parsed_data['vulnerabilities'],
-                                "severity": parsed_data['severity'],
-                                "source": "huggingface_solana",
-                                "file_path": f"hf_solana_{i:06d}.rs"
-                            }
-                            contracts.append(contract)
+                        for (i, _), parsed_data in zip(texts, parsed):
+                            if (parsed_data['source_code'] and parsed_data['vulnerabilities']
+                                    and self._first_seen(parsed_data['source_code'], self._seen_sources)):
+                                contract = {
+                                    "contract_id": f"hf_solana_{i:06d}",
+                                    "source_code": parsed_data['source_code'],
+                                    "vulnerabilities": parsed_data['vulnerabilities'],
+                                    "severity": parsed_data['severity'],
+                                    "source": "huggingface_solana",
+                                    "file_path": f"hf_solana_{i:06d}.rs"
+                                }
+                                count += 1
+                                yield contract
             
-            print(f"Downloaded {len(contracts)} contracts from Hugging Face")
+            print(f"Downloaded {count} contracts from Hugging Face")
             
         except Exception as e:
             print(f"Failed to download Hugging Face dataset: {e}")
             print("Continuing with other sources...")
-        
-        return contracts
 
-    def download_github_solana_datasets(self) -> List[Dict[str, Any]]:
-        """Download Solana vulnerability data from GitHub repositories"""
+    def _iter_records(self, data_file: Path) -> Iterator[Dict[str, Any]]:
+        """Yield records from a JSON, JSONL or Parquet data file"""
+        if data_file.suffix == '.parquet':
+            # Stream Parquet in record batches, reading only the text column
+            parquet_file = pq.ParquetFile(data_file)
+            for batch in parquet_file.iter_batches(batch_size=4096, columns=['text']):
+                yield from batch.to_pylist()
+        elif data_file.suffix == '.jsonl':
+            yield from stream_jsonl(data_file)
+        else:
+            with open(data_file, 'r', encoding='utf-8') as f:
+                yield from json.load(f)
+
+    def download_github_solana_datasets(self) -> Iterator[Dict[str, Any]]:
+        """Download Solana vulnerability data from GitHub repositories, yielding contracts"""
         print("Downloading Solana vulnerability data from GitHub...")
-        contracts = []
+        count = 0
         
         if not self.github:
             print("No GitHub token provided, skipping GitHub data collection")
-            return contracts
+            return
         
         # Target repositories for Solana security data
         target_repos = [
@@ -149,141 +452,132 @@ class RustDatasetAggregator:
             "signature", "account", "pda", "seed", "cpi", "token", "rent"
         ]
         
-        for repo_name in target_repos:
-            try:
-                print(f"Processing repository: {repo_name}")
-                repo = self.github.get_repo(repo_name)
-                
-                # Search for Rust files with vulnerability-related content
-                query = f"repo:{repo_name} language:rust ({' OR '.join(vulnerability_keywords)})"
-                results = self.github.search_code(query, sort="indexed")
-                
-                for file in results[:50]:  # Limit to 50 files per repo
-                    try:
-                        content = file.decoded_content.decode('utf-8')
-                        
-                        # Extract vulnerabilities based on code patterns
-                        detected_vulns = self._detect_vulnerabilities_in_code(content)
-                        
+        # Search for Rust files with vulnerability-related content
+        keyword_query = ' OR '.join(vulnerability_keywords)
+        
+        # Later repositories download on threads while earlier ones are scanned on processes
+        with ThreadPoolExecutor(max_workers=len(target_repos)) as fetcher, ProcessPoolExecutor() as executor:
+            fetches = {
+                repo_name: fetcher.submit(self._search_repo_files, repo_name, f"repo:{repo_name} language:rust ({keyword_query})")
+                for repo_name in target_repos
+            }
+            
+            for repo_name in target_repos:
+                try:
+                    print(f"Processing repository: {repo_name}")
+                    files = [f for f in fetches[repo_name].result() if self._first_seen(f[2], self._seen_sources)]
+                    
+                    # Extract vulnerabilities based on code patterns, across worker processes
+                    scans = executor.map(detect_vulnerabilities_in_code, [content for _, _, content in files], chunksize=8)
+                    
+                    for (sha, path, content), detected_vulns in zip(files, scans):
                         if detected_vulns:
                             contract = {
-                                "contract_id": f"github_{repo_name.replace('/', '_')}_{file.sha[:8]}",
+                                "contract_id": f"github_{repo_name.replace('/', '_')}_{sha[:8]}",
                                 "source_code": content,
                                 "vulnerabilities": detected_vulns,
                                 "severity": ["medium"],  # Default severity
                                 "source": f"github_{repo_name}",
-                                "file_path": file.path
+                                "file_path": path
                             }
-                            contracts.append(contract)
+                            count += 1
+                            yield contract
                             
-                    except Exception as e:
-                        print(f"Error processing file {file.path}: {e}")
-                        continue
-                        
-            except Exception as e:
-                print(f"Error processing repository {repo_name}: {e}")
-                continue
-        
-        print(f"Downloaded {len(contracts)} contracts from GitHub")
-        return contracts
-
-    def _detect_vulnerabilities_in_code(self, code: str) -> List[str]:
-        """Detect vulnerabilities in Rust code using pattern matching"""
-        vulnerabilities = []
-        code_lower = code.lower()
-        
-        # Pattern-based vulnerability detection
-        patterns = {
-            "unsafe_code": [r"unsafe\s*\{", r"std::ptr::", r"transmute"],
-            "account_validation": [r"#\[account\(\)\]", r"AccountInfo", r"require!.*account"],
-            "signature_verification": [r"is_signer", r"require!.*signer", r"msg\.sender"],
-            "integer_overflow": [r"\.wrapping_add", r"\.wrapping_sub", r"checked_add", r"checked_sub"],
-            "panic_handling": [r"panic!", r"unwrap\(\)", r"expect\(", r"unreachable!"],
-            "program_derivation": [r"find_program_address", r"create_program_address", r"try_find_program_address"],
-            "seed_validation": [r"seeds.*b\"", r"PDA", r"program_derived_address"],
-            "authority_validation": [r"authority", r"owner", r"admin", r"only_owner"],
-            "instruction_validation": [r"instruction", r"cpi", r"invoke", r"invoke_signed"],
-            "data_validation": [r"deserialize", r"serialize", r"borsh", r"anchor_lang"],
-            "rent_exemption": [r"rent", r"lamports", r"minimum_balance", r"rent_exempt"],
-            "token_program": [r"token_program", r"spl_token", r"transfer", r"mint"],
-            "cross_program_invocation": [r"invoke", r"invoke_signed", r"cpi", r"cross_program"],
-            "pda_validation": [r"program_derived_address", r"find_program_address", r"seeds"]
-        }
-        
-        for vuln_type, pattern_list in patterns.items():
-            for pattern in pattern_list:
-                if re.search(pattern, code_lower):
-                    if vuln_type not in vulnerabilities:
-                        vulnerabilities.append(vuln_type)
-                    break
-        
-        return vulnerabilities
-
-    def _parse_instruction_text(self, text: str) -> Dict[str, Any]:
-        """Parse instruction-following text to extract Rust code and vulnerability info"""
-        source_code = ""
-        vulnerabilities = []
-        severity = ["medium"]
-        
-        # Extract Rust code from markdown code blocks
-        rust_code_pattern = r'```(?:rust)?\s*(.*?)```'
-        rust_matches = re.findall(rust_code_pattern, text, re.DOTALL)
-        
-        if rust_matches:
-            source_code = rust_matches[0].strip()
-        
-        # Determine if vulnerable based on response
-        text_lower = text.lower()
-        
-        # Check for vulnerability indicators in the response
-        if any(indicator in text_lower for indicator in [
-            "vulnerable", "vulnerability", "exploit", "attack", "unsafe", 
-            "security issue", "bug", "flaw", "weakness", "risk"
-        ]):
-            # Extract specific vulnerability types from the text
-            vuln_patterns = {
-                "unsafe_code": [r"unsafe", r"unsafe\s*\{", r"transmute", r"std::ptr"],
-                "account_validation": [r"account.*validation", r"missing.*account", r"account.*check"],
-                "signature_verification": [r"signature", r"signer", r"authority", r"permission"],
-                "integer_overflow": [r"overflow", r"underflow", r"arithmetic", r"wrapping"],
-                "panic_handling": [r"panic", r"unwrap", r"expect", r"unreachable"],
-                "program_derivation": [r"program.*derivation", r"pda", r"program.*address"],
-                "seed_validation": [r"seed", r"seeds", r"program.*derived"],
-                "authority_validation": [r"authority", r"owner", r"admin", r"permission"],
-                "instruction_validation": [r"instruction", r"cpi", r"invoke"],
-                "data_validation": [r"data.*validation", r"deserialize", r"serialize"],
-                "rent_exemption": [r"rent", r"lamports", r"exemption"],
-                "token_program": [r"token", r"spl", r"transfer", r"mint"],
-                "cross_program_invocation": [r"cpi", r"invoke", r"cross.*program"],
-                "pda_validation": [r"pda", r"program.*derived.*address", r"seeds"]
-            }
-            
-            for vuln_type, patterns in vuln_patterns.items():
-                for pattern in patterns:
-                    if re.search(pattern, text_lower):
-                        if vuln_type not in vulnerabilities:
-                            vulnerabilities.append(vuln_type)
-                        break
-            
-            # If no specific vulnerabilities found, add generic ones
-            if not vulnerabilities:
-                vulnerabilities = ["unsafe_code", "account_validation"]
-                severity = ["high"]
-        else:
-            # No vulnerabilities detected
-            vulnerabilities = []
-            severity = []
+                except Exception as e:
+                    print(f"Error processing repository {repo_name}: {e}")
+                    continue
+        
+        print(f"Downloaded {count} contracts from GitHub")
+
+    def _first_seen(self, text: str, seen: set) -> bool:
+        """Record text's digest in seen; False if identical text was already recorded"""
+        digest = source_digest(text)
+        if digest in seen:
+            return False
+        seen.add(digest)
+        return True
+
+    def _search_repo_files(self, repo_name: str, query: str) -> List[Tuple[str, str, str]]:
+        """Search a repo and fetch hits as (sha, path, content), reusing a fresh on-disk copy"""
+        key = hashlib.sha1(f"{repo_name}|{query}".encode()).hexdigest()
+        with self._cache_lock, shelve.open(str(self.github_cache_file)) as cache:
+            cached = cache.get(key)
+        if cached is not None and time.time() - cached[0] < self.github_cache_ttl:
+            print(f"Using cached search results for {repo_name}")
+            return cached[1]
+        
+        self.github.get_repo(repo_name)
+        results = self.github.search_code(query, sort="indexed")
+        hits = list(results[:50])  # Limit to 50 files per repo
+        
+        # One GraphQL round trip for every blob; REST fallback for anything it couldn't return
+        fetched = {}
+        try:
+            fetched = self._fetch_blobs_graphql(repo_name, hits)
+        except Exception as e:
+            print(f"GraphQL fetch failed for {repo_name}, falling back to per-file requests: {e}")
+        missing = [hit for hit in hits if hit.sha not in fetched]
         
-        return {
-            "source_code": source_code,
-            "vulnerabilities": vulnerabilities,
-            "severity": severity
-        }
+        # Each decoded_content access is a blocking API round trip; overlap them
+        executor = ThreadPoolExecutor(max_workers=16)
+        try:
+            for result in executor.map(self._fetch_file, missing):
+                if result is not None:
+                    fetched[result[0]] = result[2]
+        except KeyboardInterrupt:
+            # Drop queued fetches so Ctrl+C returns promptly
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            executor.shutdown()
+        
+        files = [(hit.sha, hit.path, fetched[hit.sha]) for hit in hits if hit.sha in fetched]
+        with self._cache_lock, shelve.open(str(self.github_cache_file)) as cache:
+            cache[key] = (time.time(), files)
+        return files
+
+    def _fetch_blobs_graphql(self, repo_name: str, hits: List[Any]) -> Dict[str, str]:
+        """Fetch text blobs for search hits in a single GraphQL request, keyed by blob sha"""
+        if not hits:
+            return {}
+        owner, name = repo_name.split("/", 1)
+        fields = " ".join(
+            f'f{i}: object(oid: "{hit.sha}") {{ ... on Blob {{ text isTruncated }} }}'
+            for i, hit in enumerate(hits)
+        )
+        query = f"query {{ repository(owner: {json.dumps(owner)}, name: {json.dumps(name)}) {{ {fields} }} }}"
+        
+        response = requests.post(
+            GITHUB_GRAPHQL_URL,
+            json={"query": query},
+            headers={"Authorization": f"bearer {self.github_token}"},
+            timeout=60
+        )
+        response.raise_for_status()
+        payload = response.json()
+        repository = (payload.get("data") or {}).get("repository")
+        if repository is None:
+            raise RuntimeError(payload.get("errors"))
+        
+        blobs = {}
+        for i, hit in enumerate(hits):
+            blob = repository.get(f"f{i}")
+            # Binary blobs have no text and large ones are truncated; leave those to REST
+            if blob and blob.get("text") is not None and not blob.get("isTruncated"):
+                blobs[hit.sha] = blob["text"]
+        return blobs
+
+    def _fetch_file(self, file) -> Optional[Tuple[str, str, str]]:
+        """Fetch a search hit's content; None if it fails"""
+        try:
+            return file.sha, file.path, file.decoded_content.decode('utf-8')
+        except Exception as e:
+            print(f"Error processing file {file.path}: {e}")
+        return None
 
-    def create_rust_safe_contracts(self, count: int = 100) -> List[Dict[str, Any]]:
+    def create_rust_safe_contracts(self, count: int = 100) -> Iterator[Dict[str, Any]]:
         """Create mock safe Rust contracts for balanced dataset"""
         print(f"Creating {count} mock safe Rust contracts...")
-        contracts = []
         
         safe_contract_template = '''
 use anchor_lang::prelude::*;
@@ -388,23 +682,20 @@ pub enum ErrorCode {{
 }}
 '''
         
+        safe_parts = split_template(safe_contract_template)
         for i in range(count):
-            contract = {
+            yield {
                 "contract_id": f"safe_rust_contract_{i:03d}",
-                "source_code": safe_contract_template.format(id=i),
+                "source_code": str(i).join(safe_parts),
                 "vulnerabilities": [],  # No vulnerabilities
                 "severity": [],  # No severity
                 "source": "mock_safe_rust",
                 "file_path": f"mock_safe_rust_contract_{i:03d}.rs"
             }
-            contracts.append(contract)
-        
-        return contracts
 
-    def create_rust_vulnerable_contracts(self, count: int = 50) -> List[Dict[str, Any]]:
+    def create_rust_vulnerable_contracts(self, count: int = 50) -> Iterator[Dict[str, Any]]:
         """Create mock vulnerable Rust contracts for testing"""
         print(f"Creating {count} mock vulnerable Rust contracts...")
-        contracts = []
         
         vulnerable_templates = [
             {
@@ -543,92 +834,86 @@ pub struct RiskyOperation<'info> {{
             }
         ]
         
+        template_parts = [split_template(t["template"]) for t in vulnerable_templates]
+        
         for i in range(count):
             template = vulnerable_templates[i % len(vulnerable_templates)]
-            contract = {
+            yield {
                 "contract_id": f"vulnerable_rust_{template['vulnerability']}_{i:03d}",
-                "source_code": template["template"].format(id=i),
+                "source_code": str(i).join(template_parts[i % len(vulnerable_templates)]),
                 "vulnerabilities": [template["vulnerability"]],
                 "severity": ["high"],
                 "source": "mock_vulnerable_rust",
                 "file_path": f"mock_vulnerable_rust_{template['vulnerability']}_{i:03d}.rs"
             }
-            contracts.append(contract)
-        
-        return contracts
 
     def aggregate_all(self) -> str:
-        """Aggregate all Rust datasets into unified format"""
+        """Aggregate all Rust datasets into unified format, streamed to JSON Lines"""
         print("Starting Rust dataset aggregation...")
         
-        all_contracts = []
+        # Each source is a generator that handles its own download failures
+        sources = [
+            self.download_huggingface_solana_dataset(),
+            self.download_github_solana_datasets(),
+            self.create_rust_safe_contracts(100),
+            self.create_rust_vulnerable_contracts(50),
+        ]
         
-        # Download Hugging Face Solana dataset
-        try:
-            hf_contracts = self.download_huggingface_solana_dataset()
-            all_contracts.extend(hf_contracts)
-            print(f"Added {len(hf_contracts)} contracts from Hugging Face")
-        except Exception as e:
-            print(f"Hugging Face download failed: {e}")
+        # Save unified dataset as Parquet (for training) and JSON Lines (for merging) in one pass;
+        # outputs are written beside their targets and swapped in only once complete
+        output_file = self.processed_dir / "unified_rust_dataset.jsonl"
+        parquet_file = self.processed_dir / "unified_rust_dataset.parquet"
+        outputs = [output_file, parquet_file] if pa is not None else [output_file]
+        tmp_files = {path: path.with_name(path.name + ".tmp") for path in outputs}
         
-        # Download GitHub Solana datasets
+        contracts = chain.from_iterable(sources)
+        if pa is not None:
+            contracts = write_parquet(tmp_files[parquet_file], contracts)
         try:
-            github_contracts = self.download_github_solana_datasets()
-            all_contracts.extend(github_contracts)
-            print(f"Added {len(github_contracts)} contracts from GitHub")
-        except Exception as e:
-            print(f"GitHub download failed: {e}")
-        
-        # Add mock safe Rust contracts
-        safe_contracts = self.create_rust_safe_contracts(100)
-        all_contracts.extend(safe_contracts)
-        
-        # Add mock vulnerable Rust contracts
-        vulnerable_contracts = self.create_rust_vulnerable_contracts(50)
-        all_contracts.extend(vulnerable_contracts)
+            with open(tmp_files[output_file], 'wb') as f:
+                stats = self.generate_statistics(write_jsonl(f, contracts))
+        except BaseException:
+            if pa is not None:
+                contracts.close()  # Closes the Parquet writer before its file is removed
+            for tmp_file in tmp_files.values():
+                tmp_file.unlink(missing_ok=True)
+            raise
+        for path, tmp_file in tmp_files.items():
+            os.replace(tmp_file, path)
         
-        # Save unified dataset
-        output_file = self.processed_dir / "unified_rust_dataset.json"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(all_contracts, f, indent=2, ensure_ascii=False)
-        
-        # Generate statistics
-        stats = self.generate_statistics(all_contracts)
         stats_file = self.processed_dir / "rust_dataset_statistics.json"
-        with open(stats_file, 'w', encoding='utf-8') as f:
-            json.dump(stats, f, indent=2, ensure_ascii=False)
+        write_json(stats_file, stats)
         
         print(f"Rust dataset aggregation complete!")
-        print(f"Total contracts: {len(all_contracts)}")
+        print(f"Total contracts: {stats['total_contracts']}")
         print(f"Output file: {output_file}")
+        if pa is not None:
+            print(f"Parquet file: {parquet_file}")
         print(f"Statistics: {stats_file}")
         
         return str(output_file)
 
-    def generate_statistics(self, contracts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def generate_statistics(self, contracts: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
         """Generate dataset statistics"""
-        total_contracts = len(contracts)
-        vulnerable_contracts = sum(1 for c in contracts if c["vulnerabilities"])
-        safe_contracts = total_contracts - vulnerable_contracts
-        
-        # Count by vulnerability type
-        vuln_counts = {}
-        for contract in contracts:
-            for vuln in contract["vulnerabilities"]:
-                vuln_counts[vuln] = vuln_counts.get(vuln, 0) + 1
+        total_contracts = 0
+        vulnerable_contracts = 0
+        vuln_counts = Counter()
+        source_counts = Counter()
         
-        # Count by source
-        source_counts = {}
+        # Count by vulnerability type and source in one pass
         for contract in contracts:
-            source = contract["source"]
-            source_counts[source] = source_counts.get(source, 0) + 1
+            total_contracts += 1
+            if contract["vulnerabilities"]:
+                vulnerable_contracts += 1
+            vuln_counts.update(contract["vulnerabilities"])
+            source_counts[contract["source"]] += 1
         
         return {
             "total_contracts": total_contracts,
             "vulnerable_contracts": vulnerable_contracts,
-            "safe_contracts": safe_contracts,
-            "vulnerability_distribution": vuln_counts,
-            "source_distribution": source_counts,
+            "safe_contracts": total_contracts - vulnerable_contracts,
+            "vulnerability_distribution": dict(vuln_counts),
+            "source_distribution": dict(source_counts),
             "vulnerability_types": list(self.vulnerability_mapping.values())
         }
 
@@ -639,10 +924,15 @@ def main():
     parser = argparse.ArgumentParser(description="Aggregate Rust/Solana vulnerability datasets")
     parser.add_argument("--github-token", type=str, help="GitHub personal access token for API access")
     parser.add_argument("--output-dir", type=str, default="datasets", help="Output directory for datasets")
+    parser.add_argument("--github-cache-ttl", type=int, default=24 * 3600, help="Seconds to reuse cached GitHub search results (0 disables)")
     
     args = parser.parse_args()
     
-    aggregator = RustDatasetAggregator(output_dir=args.output_dir, github_token=args.github_token)
+    aggregator = RustDatasetAggregator(
+        output_dir=args.output_dir,
+        github_token=args.github_token,
+        github_cache_ttl=args.github_cache_ttl
+    )
     output_file = aggregator.aggregate_all()
     print(f"Unified Rust dataset saved to: {output_file}")
 
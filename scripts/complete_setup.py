@@ -16,51 +16,92 @@ import os
 import sys
 import subprocess
 import shutil
+import shlex
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-def run_command(command, cwd=None, shell=True):
-    """Run a command and return success status"""
+_log_buf: list[str] = []
+
+def log(message=""):
+    """Queue a line of output; written out by flush_log()"""
+    _log_buf.append(message)
+
+def flush_log():
+    """Write all queued output in one call"""
+    if _log_buf:
+        sys.stdout.write("\n".join(_log_buf) + "\n")
+        sys.stdout.flush()
+        _log_buf.clear()
+
+def format_command(command):
+    """Render a command (string or argv list) for display"""
+    return command if isinstance(command, str) else ' '.join(command)
+
+def execute_command(command, cwd=None, shell=False):
+    """Run a command and return (success, error message) without printing"""
     try:
-        result = subprocess.run(command, shell=shell, cwd=cwd, capture_output=True, text=True)
+        if not shell:
+            if isinstance(command, str):
+                command = shlex.split(command)
+            # Resolve the program ourselves (e.g. npm -> npm.cmd on Windows) since no shell does it
+            command = [shutil.which(command[0]) or command[0], *command[1:]]
+        # Only stderr is reported, so don't buffer pip/npm progress logs from stdout
+        result = subprocess.run(command, shell=shell, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
         if result.returncode == 0:
-            print(f"✅ {command}")
-            return True
-        else:
-            print(f"❌ {command}")
-            print(f"   Error: {result.stderr}")
-            return False
+            return True, None
+        return False, f"Error: {result.stderr}"
     except Exception as e:
-        print(f"❌ {command}")
-        print(f"   Exception: {e}")
-        return False
+        return False, f"Exception: {e}"
+
+def report_command(command, success, error=None):
+    """Print the outcome of a command"""
+    command = format_command(command)
+    if success:
+        log(f"✅ {command}")
+    else:
+        log(f"❌ {command}")
+        log(f"   {error}")
+
+def run_command(command, cwd=None, shell=False):
+    """Run a command and return success status"""
+    success, error = execute_command(command, cwd=cwd, shell=shell)
+    report_command(command, success, error)
+    return success
 
 def check_prerequisites():
     """Check if required tools are installed"""
-    print("🔍 Checking prerequisites...")
+    log("🔍 Checking prerequisites...")
     
     tools = {
-        'python': 'python --version',
-        'node': 'node --version',
-        'npm': 'npm --version'
+        'python': ['python', '--version'],
+        'node': ['node', '--version'],
+        'npm': ['npm', '--version']
     }
     
+    # Spawn the version checks together; report in a fixed order once all are done
+    with ThreadPoolExecutor(max_workers=len(tools)) as executor:
+        results = dict(zip(tools, executor.map(execute_command, tools.values())))
+    
     missing_tools = []
     
     for tool, command in tools.items():
-        if not run_command(command):
+        success, error = results[tool]
+        report_command(command, success, error)
+        if not success:
             missing_tools.append(tool)
     
     if missing_tools:
-        print(f"\n❌ Missing tools: {', '.join(missing_tools)}")
-        print("Please install the missing tools and run this script again.")
+        log(f"\n❌ Missing tools: {', '.join(missing_tools)}")
+        log("Please install the missing tools and run this script again.")
         return False
     
-    print("✅ All prerequisites found")
+    log("✅ All prerequisites found")
     return True
 
 def setup_environment_files():
     """Set up environment files"""
-    print("\n📝 Setting up environment files...")
+    log("\n📝 Setting up environment files...")
     
     # Copy example files to .env files
     env_files = [
@@ -71,65 +112,108 @@ def setup_environment_files():
     ]
     
     for src, dst in env_files:
-        if Path(src).exists():
-            shutil.copy2(src, dst)
-            print(f"✅ Created {dst}")
-        else:
-            print(f"⚠️  Source file not found: {src}")
-
-def setup_python_services():
-    """Set up Python services (ML Engine and Backend API)"""
-    print("\n🐍 Setting up Python services...")
-    
-    # ML Engine setup
-    print("Setting up ML Engine...")
-    ml_commands = [
-        'python -m venv .venv',
-        '.venv\\Scripts\\python.exe -m pip install --upgrade pip',
-        '.venv\\Scripts\\python.exe -m pip install -r requirements.txt'
-    ]
+        try:
+            shutil.copyfile(src, dst)
+            log(f"✅ Created {dst}")
+        except FileNotFoundError:
+            log(f"⚠️  Source file not found: {src}")
+
+def venv_python(service_dir):
+    """Absolute path of a service's venv interpreter"""
+    # Absolute, since a relative program path isn't resolved against cwd on Windows without a shell
+    return str(Path(service_dir, '.venv', 'Scripts', 'python.exe').resolve())
+
+def venv_commands(name, service_dir):
+    """Venv and requirements commands for a service, skipping steps that are already done,
+    plus the (pip command, hash file, requirements hash) stamp to record once pip succeeds"""
+    python = venv_python(service_dir)
+    commands = []
+    stamp = None
     
-    for command in ml_commands:
-        if not run_command(command, cwd='ml-engine'):
-            print(f"⚠️  ML Engine setup had issues with: {command}")
-    
-    # Backend API setup
-    print("Setting up Backend API...")
-    backend_commands = [
-        'python -m venv .venv',
-        '.venv\\Scripts\\python.exe -m pip install --upgrade pip',
-        '.venv\\Scripts\\python.exe -m pip install -r requirements.txt',
-        '.venv\\Scripts\\python.exe -c "from app.database import create_tables; create_tables(); print(\'Database initialized\')"'
-    ]
+    if Path(python).exists():
+        log(f"✅ {name} venv exists, skipping")
+    else:
+        commands.append(['python', '-m', 'venv', '.venv', '--upgrade-deps'])
     
-    for command in backend_commands:
-        if not run_command(command, cwd='backend-api'):
-            print(f"⚠️  Backend API setup had issues with: {command}")
+    # Reinstall only when requirements.txt changed since the last successful install
+    hash_file = Path(service_dir, '.venv', '.req_hash')
+    try:
+        req_hash = hashlib.sha256(Path(service_dir, 'requirements.txt').read_bytes()).hexdigest()
+    except FileNotFoundError:
+        req_hash = None
+    
+    if req_hash is not None and hash_file.exists() and hash_file.read_text() == req_hash:
+        log(f"✅ {name} requirements unchanged, skipping pip install")
+    else:
+        pip_command = [python, '-m', 'pip', 'install', '-r', 'requirements.txt']
+        commands.append(pip_command)
+        if req_hash is not None:
+            stamp = (pip_command, hash_file, req_hash)
+    
+    return commands, stamp
 
-def setup_node_services():
-    """Set up Node.js services (Frontend and Oracle)"""
-    print("\n📦 Setting up Node.js services...")
+def python_service_jobs():
+    """Setup jobs for Python services (ML Engine and Backend API)"""
+    ml_commands, ml_stamp = venv_commands("ML Engine", 'ml-engine')
     
-    # Frontend setup
-    print("Setting up Frontend...")
-    if not run_command('npm install', cwd='frontend'):
-        print("⚠️  Frontend setup had issues")
+    backend_commands, backend_stamp = venv_commands("Backend API", 'backend-api')
+    backend_commands.append(
+        [venv_python('backend-api'), '-c', "from app.database import create_tables; create_tables(); print('Database initialized')"]
+    )
     
-    # Oracle setup
-    print("Setting up Oracle Service...")
-    if not run_command('npm install', cwd='oracle-service'):
-        print("⚠️  Oracle Service setup had issues")
+    return [
+        ("ML Engine", 'ml-engine', ml_commands, ml_stamp),
+        ("Backend API", 'backend-api', backend_commands, backend_stamp)
+    ]
+
+def node_service_jobs():
+    """Setup jobs for Node.js services (Frontend and Oracle)"""
+    return [
+        ("Frontend", 'frontend', [['npm', 'install']], None),
+        ("Oracle Service", 'oracle-service', [['npm', 'install']], None)
+    ]
+
+def mock_data_jobs():
+    """Setup job that generates the mock dataset for testing"""
+    return [("Mock dataset", None, [['python', 'scripts/aggregate_datasets.py']], None)]
 
-def generate_mock_data():
-    """Generate mock dataset for testing"""
-    print("\n📊 Generating mock dataset...")
+def run_setup_job(cwd, commands, stamp=None):
+    """Run one job's commands in order, stopping at the first failure"""
+    results = []
+    for command in commands:
+        success, error = execute_command(command, cwd=cwd)
+        results.append((command, success, error))
+        if not success:
+            # Later steps depend on earlier ones (e.g. pip needs the venv)
+            break
+        if stamp is not None and command is stamp[0]:
+            # Record the installed requirements so the next run can skip pip;
+            # if the stamp cannot be written, pip simply runs again next time
+            _, hash_file, req_hash = stamp
+            try:
+                hash_file.write_text(req_hash)
+            except OSError:
+                pass
+    return results
+
+def run_setup_jobs(jobs):
+    """Run independent setup jobs concurrently, then report each job in order"""
+    log("\n🛠️  Setting up services...")
+    
+    # Jobs touch disjoint directories, so pip and npm installs can overlap
+    with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+        futures = [executor.submit(run_setup_job, cwd, commands, stamp) for _, cwd, commands, stamp in jobs]
     
-    if not run_command('python scripts/aggregate_datasets.py'):
-        print("⚠️  Mock dataset generation had issues")
+    for (name, _, _, _), future in zip(jobs, futures):
+        log(f"Setting up {name}...")
+        for command, success, error in future.result():
+            report_command(command, success, error)
+            if not success:
+                log(f"⚠️  {name} setup aborted at: {format_command(command)}")
 
 def create_startup_scripts():
     """Create startup scripts for different platforms"""
-    print("\n🚀 Creating startup scripts...")
+    log("\n🚀 Creating startup scripts...")
     
     # Windows batch file
     windows_script = """@echo off
@@ -159,14 +243,24 @@ echo API Docs: http://localhost:8000/docs
 pause
 """
     
-    with open('start_services.bat', 'w') as f:
-        f.write(windows_script)
-    
-    print("✅ Created start_services.bat")
+    # Leave the file (and its mtime) alone when the content is unchanged
+    script_path = Path('start_services.bat')
+    new_content = windows_script.replace('\n', os.linesep).encode()
+    if not script_path.exists() or script_path.read_bytes() != new_content:
+        script_path.write_bytes(new_content)
+        log("✅ Created start_services.bat")
+    else:
+        log("✅ start_services.bat up to date")
 
 def main():
-    print("🚀 SecuRizz Complete Setup")
-    print("=" * 50)
+    try:
+        run_setup()
+    finally:
+        flush_log()
+
+def run_setup():
+    log("🚀 SecuRizz Complete Setup")
+    log("=" * 50)
     
     # Check prerequisites
     if not check_prerequisites():
@@ -175,35 +269,32 @@ def main():
     # Set up environment files
     setup_environment_files()
     
-    # Set up Python services
-    setup_python_services()
-    
-    # Set up Node.js services
-    setup_node_services()
+    # Show progress so far before the long-running installs start
+    flush_log()
     
-    # Generate mock data
-    generate_mock_data()
+    # Set up Python and Node.js services and generate mock data, in parallel
+    run_setup_jobs(python_service_jobs() + node_service_jobs() + mock_data_jobs())
     
     # Create startup scripts
     create_startup_scripts()
     
-    print("\n" + "=" * 50)
-    print("🎉 Setup complete!")
-    print("\n📋 Next steps:")
-    print("1. Update .env files with your API keys:")
-    print("   - Pinata API keys for IPFS")
-    print("   - Solana program ID (after deployment)")
-    print("   - Switchboard oracle credentials")
-    print("\n2. Deploy Solana program:")
-    print("   - Follow DEPLOYMENT.md instructions")
-    print("   - Run: python scripts/update_program_id.py <PROGRAM_ID>")
-    print("\n3. Start services:")
-    print("   - Windows: double-click start_services.bat")
-    print("   - Or manually start each service")
-    print("\n4. Test the application:")
-    print("   - Frontend: http://localhost:3000")
-    print("   - API Docs: http://localhost:8000/docs")
-    print("\n🎯 Happy auditing!")
+    log("\n" + "=" * 50)
+    log("🎉 Setup complete!")
+    log("\n📋 Next steps:")
+    log("1. Update .env files with your API keys:")
+    log("   - Pinata API keys for IPFS")
+    log("   - Solana program ID (after deployment)")
+    log("   - Switchboard oracle credentials")
+    log("\n2. Deploy Solana program:")
+    log("   - Follow DEPLOYMENT.md instructions")
+    log("   - Run: python scripts/update_program_id.py <PROGRAM_ID>")
+    log("\n3. Start services:")
+    log("   - Windows: double-click start_services.bat")
+    log("   - Or manually start each service")
+    log("\n4. Test the application:")
+    log("   - Frontend: http://localhost:3000")
+    log("   - API Docs: http://localhost:8000/docs")
+    log("\n🎯 Happy auditing!")
 
 if __name__ == "__main__":
     main()
@@ -6,6 +6,8 @@ Deploy SECURIZZ token and initialize tokenomics
 import asyncio
 import json
 import os
+from functools import cached_property
+from pathlib import Path
 from solana.rpc.async_api import AsyncClient
 from solana.publickey import PublicKey
 from solana.keypair import Keypair
@@ -14,20 +16,32 @@ from solana.system_program import create_account, CreateAccountParams
 from solana.rpc.types import TxOpts
 import base64
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+SOLANA_RPC_URL = os.getenv("SOLANA_RPC_URL", "https://api.devnet.solana.com")
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 class SecuRizzTokenDeployer:
     def __init__(self):
-        self.rpc_url = os.getenv("SOLANA_RPC_URL", "https://api.devnet.solana.com")
-        self.client = AsyncClient(self.rpc_url)
+        self.rpc_url = SOLANA_RPC_URL
+    
+    @cached_property
+    def client(self):
+        """RPC client, opened on first use"""
+        return AsyncClient(self.rpc_url)
         
-    async def deploy_token(self):
+    async def deploy_token(self, mint_keypair: Keypair, mint_authority: Keypair):
         """Deploy SECURIZZ token"""
         try:
             print("🚀 Deploying SECURIZZ token...")
             
-            # Create token mint
-            mint_keypair = Keypair.generate()
-            mint_authority = Keypair.generate()
-            
             # Token metadata
             token_metadata = {
                 "name": "SecuRizz Token",
@@ -60,15 +74,11 @@ class SecuRizzTokenDeployer:
             print(f"❌ Token deployment failed: {str(e)}")
             return None
 
-    async def initialize_staking_pool(self, mint_address: str):
+    async def initialize_staking_pool(self, mint_address: str, staking_pool: Keypair, staking_authority: Keypair):
         """Initialize staking pool for SECURIZZ"""
         try:
             print("🏦 Initializing staking pool...")
             
-            # Create staking pool account
-            staking_pool = Keypair.generate()
-            staking_authority = Keypair.generate()
-            
             # Staking parameters
             staking_config = {
                 "reward_rate": 0.01,  # 1% daily
@@ -92,15 +102,11 @@ class SecuRizzTokenDeployer:
             print(f"❌ Staking pool initialization failed: {str(e)}")
             return None
 
-    async def setup_governance(self, token_mint: str):
+    async def setup_governance(self, token_mint: str, dao_treasury: Keypair, governance_token: Keypair):
         """Setup DAO governance"""
         try:
             print("🏛️ Setting up DAO governance...")
             
-            # Create governance accounts
-            dao_treasury = Keypair.generate()
-            governance_token = Keypair.generate()
-            
             # Governance parameters
             governance_config = {
                 "voting_delay": 86400,  # 1 day
@@ -129,25 +135,26 @@ class SecuRizzTokenDeployer:
         try:
             print("💰 Creating initial token distribution...")
             
-            # Distribution plan
+            # Distribution plan in parts per million
             distribution = {
-                "community": 0.40,  # 40% - Community rewards
-                "team": 0.20,  # 20% - Team allocation
-                "treasury": 0.20,  # 20% - DAO treasury
-                "liquidity": 0.15,  # 15% - Liquidity pools
-                "reserve": 0.05,  # 5% - Reserve fund
+                "community": 400000,  # 40% - Community rewards
+                "team": 200000,  # 20% - Team allocation
+                "treasury": 200000,  # 20% - DAO treasury
+                "liquidity": 150000,  # 15% - Liquidity pools
+                "reserve": 50000,  # 5% - Reserve fund
             }
             
             total_supply = 1000000000  # 1B tokens
             
-            allocations = {}
-            for category, percentage in distribution.items():
-                amount = int(total_supply * percentage)
-                allocations[category] = {
-                    "amount": amount,
-                    "percentage": percentage * 100,
-                    "vesting": "immediate" if category in ["liquidity", "reserve"] else "24_months"
+            allocations = {
+                category: {
+                    "amount": total_supply * ppm // 1000000,
+                    "percentage": ppm / 10000,
+                    "vesting": "immediate" if category in ("liquidity", "reserve") else "24_months"
                 }
+                for category, ppm in distribution.items()
+            }
+            assert sum(a["amount"] for a in allocations.values()) == total_supply
             
             print("✅ Initial distribution created!")
             for category, allocation in allocations.items():
@@ -200,30 +207,30 @@ class SecuRizzTokenDeployer:
         try:
             print("🚀 Deploying complete SecuRizz ecosystem...")
             
+            # Generate every account keypair up front
+            (mint_keypair, mint_authority, staking_pool, staking_authority,
+             dao_treasury, governance_token) = [Keypair.generate() for _ in range(6)]
+            
             # 1. Deploy token
-            token_info = await self.deploy_token()
+            token_info = await self.deploy_token(mint_keypair, mint_authority)
             if not token_info:
                 return None
             
-            # 2. Initialize staking
-            staking_info = await self.initialize_staking_pool(token_info["mint"])
-            if not staking_info:
-                return None
-            
-            # 3. Setup governance
-            governance_info = await self.setup_governance(token_info["mint"])
-            if not governance_info:
-                return None
-            
-            # 4. Create distribution
-            distribution = await self.create_initial_distribution(token_info["mint"])
-            if not distribution:
-                return None
-            
-            # 5. Setup revenue
-            revenue = await self.setup_revenue_model()
-            if not revenue:
-                return None
+            # 2-5. Staking, governance, distribution and revenue only depend on the mint
+            results = await asyncio.gather(
+                self.initialize_staking_pool(token_info["mint"], staking_pool, staking_authority),
+                self.setup_governance(token_info["mint"], dao_treasury, governance_token),
+                self.create_initial_distribution(token_info["mint"]),
+                self.setup_revenue_model(),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    print(f"❌ Deployment step failed: {str(result)}")
+                    return None
+                if not result:
+                    return None
+            staking_info, governance_info, distribution, revenue = results
             
             # Save deployment info
             deployment_info = {
@@ -235,8 +242,11 @@ class SecuRizzTokenDeployer:
                 "deployed_at": "2024-01-01T00:00:00Z"
             }
             
-            with open("deployment_info.json", "w") as f:
-                json.dump(deployment_info, f, indent=2)
+            if orjson is not None:
+                Path("deployment_info.json").write_bytes(orjson.dumps(deployment_info, option=orjson.OPT_INDENT_2))
+            else:
+                with open("deployment_info.json", "w") as f:
+                    json.dump(deployment_info, f, indent=2)
             
             print("🎉 SecuRizz tokenomics deployment complete!")
             print(f"Deployment info saved to: deployment_info.json")
@@ -249,7 +259,8 @@ class SecuRizzTokenDeployer:
 
     async def close(self):
         """Close client connection"""
-        await self.client.close()
+        if "client" in self.__dict__:
+            await self.client.close()
 
 async def main():
     deployer = SecuRizzTokenDeployer()
@@ -263,4 +274,7 @@ async def main():
         await deployer.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
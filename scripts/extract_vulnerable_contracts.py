@@ -6,30 +6,80 @@ Extracts Rust/Solana contracts from various security databases and reports.
 
 import json
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import re
 import time
+import shelve
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable
 from urllib.parse import urljoin, urlparse
 import hashlib
+from datetime import timedelta
 from bs4 import BeautifulSoup
-import feedparser
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import requests_cache
+except ImportError:
+    requests_cache = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 class VulnerableContractExtractor:
+    _rust_indicators = (
+        'use ', 'fn ', 'struct ', 'impl ', 'pub ', 'let ', 'mut ',
+        'anchor_lang', 'solana_program', 'borsh', 'derive',
+        'AccountInfo', 'Program', 'Context', 'Result<()>'
+    )
+    
+    # Markdown code in CVE descriptions and GitHub issue bodies
+    _inline_code_re = re.compile(r'```[\s\S]*?```|`[^`]+`')
+    _fence_marker_re = re.compile(r'```.*?\n?')
+    _code_fence_re = re.compile(r'```(?:rust)?\s*(.*?)```', re.DOTALL)
+    
     def __init__(self, output_dir: str = "datasets/raw"):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.session = self._create_session()
+        
+        # Per-host politeness: at most one report request per interval to each host
+        self.min_request_interval = 0.2
+        self._rate_lock = threading.Lock()
+        self._next_request_at: Dict[str, float] = {}
+        
+        # Extraction results per report page, keyed by page content
+        self.block_cache_file = self.output_dir / "block_cache"
+        self._cache_lock = threading.Lock()  # reports are processed concurrently
+        
+        # JSON Lines log written while extract_all_sources runs, so finished work survives a crash
+        self._crawl_log = None
+        self._crawl_log_lock = threading.Lock()
         
         # Vulnerability patterns for Rust/Solana
         self.vulnerability_patterns = {
             "unsafe_code": [r"unsafe\s*\{", r"std::ptr::", r"transmute", r"raw.*pointer"],
-            "account_validation": [r"#\[account\(\)\]", r"AccountInfo", r"require!.*account"],
+            "account_validation": [r"#\[account\(\)\]", r"require!.*account"],
             "signature_verification": [r"is_signer", r"require!.*signer", r"msg\.sender"],
             "integer_overflow": [r"\.wrapping_add", r"\.wrapping_sub", r"checked_add", r"checked_sub"],
             "panic_handling": [r"panic!", r"unwrap\(\)", r"expect\(", r"unreachable!"],
             "program_derivation": [r"find_program_address", r"create_program_address", r"try_find_program_address"],
-            "seed_validation": [r"seeds.*b\"", r"PDA", r"program_derived_address"],
+            "seed_validation": [r"seeds.*b\"", r"program_derived_address"],
             "authority_validation": [r"authority", r"owner", r"admin", r"only_owner"],
             "instruction_validation": [r"instruction", r"cpi", r"invoke", r"invoke_signed"],
             "data_validation": [r"deserialize", r"serialize", r"borsh", r"anchor_lang"],
@@ -38,166 +88,174 @@ class VulnerableContractExtractor:
             "cross_program_invocation": [r"invoke", r"invoke_signed", r"cpi", r"cross_program"],
             "pda_validation": [r"program_derived_address", r"find_program_address", r"seeds"]
         }
-
-    def extract_from_rekt_news(self) -> List[Dict[str, Any]]:
-        """Extract vulnerable contracts from Rekt.news"""
-        print("Extracting from Rekt.news...")
-        contracts = []
         
-        try:
-            # Get the main page
-            response = requests.get("https://rekt.news/", timeout=30)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Find links to hack reports
-            hack_links = []
-            for link in soup.find_all('a', href=True):
-                href = link['href']
-                if '/rekt/' in href or '/hack/' in href:
-                    hack_links.append(urljoin("https://rekt.news", href))
-            
-            # Process each hack report
-            for link in hack_links[:20]:  # Limit to 20 reports
-                try:
-                    time.sleep(1)  # Be respectful
-                    report_response = requests.get(link, timeout=30)
-                    report_response.raise_for_status()
-                    report_soup = BeautifulSoup(report_response.content, 'html.parser')
-                    
-                    # Extract code blocks
-                    code_blocks = report_soup.find_all(['code', 'pre'])
-                    for block in code_blocks:
-                        code_text = block.get_text().strip()
-                        if self._is_rust_code(code_text):
-                            vulnerabilities = self._detect_vulnerabilities(code_text)
-                            if vulnerabilities:
-                                contract = {
-                                    "contract_id": f"rekt_{hashlib.md5(link.encode()).hexdigest()[:8]}",
-                                    "source_code": code_text,
-                                    "vulnerabilities": vulnerabilities,
-                                    "severity": ["high"],
-                                    "source": "rekt_news",
-                                    "file_path": f"rekt_{link.split('/')[-1]}.rs",
-                                    "url": link
-                                }
-                                contracts.append(contract)
-                                
-                except Exception as e:
-                    print(f"Error processing {link}: {e}")
-                    continue
-                    
-        except Exception as e:
-            print(f"Error extracting from Rekt.news: {e}")
-        
-        print(f"Extracted {len(contracts)} contracts from Rekt.news")
-        return contracts
+        # Each distinct pattern once, with every vulnerability type it indicates
+        pattern_types: Dict[str, List[str]] = {}
+        for vuln_type, patterns in self.vulnerability_patterns.items():
+            for pattern in patterns:
+                pattern_types.setdefault(pattern, []).append(vuln_type)
+        self._compiled_patterns = [
+            (re.compile(pattern, re.IGNORECASE), frozenset(types))
+            for pattern, types in pattern_types.items()
+        ]
+        self._pattern_set = self._build_pattern_set(pattern_types)
 
-    def extract_from_immunefi(self) -> List[Dict[str, Any]]:
-        """Extract vulnerable contracts from Immunefi reports"""
-        print("Extracting from Immunefi...")
+    def _create_session(self) -> requests.Session:
+        """HTTP session that keeps connections alive and retries transient failures"""
+        if requests_cache is not None:
+            # Published reports rarely change; reruns parse from the on-disk cache
+            session = requests_cache.CachedSession(
+                str(self.output_dir / "http_cache"),
+                backend="sqlite",
+                expire_after=timedelta(days=7),
+                allowable_methods=("GET",),
+                stale_if_error=True,
+                cache_control=True
+            )
+        else:
+            session = requests.Session()
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=retry)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update({"User-Agent": "SecuRizz-dataset-extractor/1.0"})
+        return session
+
+    def _extract_html_source(self, name: str, index_url: str, base_url: str, is_report_link: Callable[[str], bool],
+                             prefix: str, source: str, limit: int) -> List[Dict[str, Any]]:
+        """Extract vulnerable contracts from the report pages linked from an HTML index page"""
+        print(f"Extracting from {name}...")
         contracts = []
         
         try:
-            # Get the explore page
-            response = requests.get("https://immunefi.com/explore/", timeout=30)
+            # Get the index page
+            response = self.session.get(index_url, timeout=30)
             response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
             
             # Find report links
             report_links = []
-            for link in soup.find_all('a', href=True):
-                href = link['href']
-                if '/exploit/' in href or '/bug-bounty/' in href:
-                    report_links.append(urljoin("https://immunefi.com", href))
+            for href in self._extract_links(response.content):
+                if is_report_link(href):
+                    report_links.append(urljoin(base_url, href))
             
-            # Process reports
-            for link in report_links[:15]:  # Limit to 15 reports
-                try:
-                    time.sleep(1)
-                    report_response = requests.get(link, timeout=30)
-                    report_response.raise_for_status()
-                    report_soup = BeautifulSoup(report_response.content, 'html.parser')
-                    
-                    # Extract code blocks
-                    code_blocks = report_soup.find_all(['code', 'pre'])
-                    for block in code_blocks:
-                        code_text = block.get_text().strip()
-                        if self._is_rust_code(code_text):
-                            vulnerabilities = self._detect_vulnerabilities(code_text)
-                            if vulnerabilities:
-                                contract = {
-                                    "contract_id": f"immunefi_{hashlib.md5(link.encode()).hexdigest()[:8]}",
-                                    "source_code": code_text,
-                                    "vulnerabilities": vulnerabilities,
-                                    "severity": ["high"],
-                                    "source": "immunefi",
-                                    "file_path": f"immunefi_{link.split('/')[-1]}.rs",
-                                    "url": link
-                                }
-                                contracts.append(contract)
-                                
-                except Exception as e:
-                    print(f"Error processing {link}: {e}")
-                    continue
+            # Process reports concurrently
+            contracts.extend(self._process_reports(report_links[:limit], prefix, source))
                     
         except Exception as e:
-            print(f"Error extracting from Immunefi: {e}")
+            print(f"Error extracting from {name}: {e}")
         
-        print(f"Extracted {len(contracts)} contracts from Immunefi")
+        print(f"Extracted {len(contracts)} contracts from {name}")
         return contracts
 
+    def extract_from_rekt_news(self) -> List[Dict[str, Any]]:
+        """Extract vulnerable contracts from Rekt.news"""
+        return self._extract_html_source(
+            "Rekt.news", "https://rekt.news/", "https://rekt.news",
+            lambda href: '/rekt/' in href or '/hack/' in href,
+            "rekt", "rekt_news", limit=20
+        )
+
+    def extract_from_immunefi(self) -> List[Dict[str, Any]]:
+        """Extract vulnerable contracts from Immunefi reports"""
+        return self._extract_html_source(
+            "Immunefi", "https://immunefi.com/explore/", "https://immunefi.com",
+            lambda href: '/exploit/' in href or '/bug-bounty/' in href,
+            "immunefi", "immunefi", limit=15
+        )
+
     def extract_from_slowmist(self) -> List[Dict[str, Any]]:
         """Extract vulnerable contracts from SlowMist Hacked"""
-        print("Extracting from SlowMist Hacked...")
+        return self._extract_html_source(
+            "SlowMist", "https://hacked.slowmist.io/en/", "https://hacked.slowmist.io",
+            lambda href: '/hack/' in href,
+            "slowmist", "slowmist", limit=15
+        )
+
+    @staticmethod
+    def _extract_links(html: bytes) -> List[str]:
+        """href of every link in an HTML page"""
+        if LexborHTMLParser is not None:
+            return [node.attributes["href"] or "" for node in LexborHTMLParser(html).css("a[href]")]
+        soup = BeautifulSoup(html, 'html.parser')
+        return [link['href'] for link in soup.find_all('a', href=True)]
+
+    @staticmethod
+    def _extract_code_blocks(html: bytes) -> List[str]:
+        """Stripped text of every <code> and <pre> element, in document order"""
+        if LexborHTMLParser is not None:
+            return [node.text().strip() for node in LexborHTMLParser(html).css("code, pre")]
+        soup = BeautifulSoup(html, 'html.parser')
+        return [block.get_text().strip() for block in soup.find_all(['code', 'pre'])]
+
+    def _log_contracts(self, contracts: List[Dict[str, Any]]):
+        """Append contracts to the crawl log, if one is open, and flush it"""
+        if self._crawl_log is None or not contracts:
+            return
+        with self._crawl_log_lock:
+            for contract in contracts:
+                if orjson is not None:
+                    self._crawl_log.write(orjson.dumps(contract) + b"\n")
+                else:
+                    self._crawl_log.write((json.dumps(contract, ensure_ascii=False) + "\n").encode('utf-8'))
+            self._crawl_log.flush()
+
+    def _wait_for_host(self, url: str):
+        """Block until this host's next request slot, without holding up other hosts"""
+        host = urlparse(url).netloc
+        with self._rate_lock:
+            now = time.monotonic()
+            slot = max(now, self._next_request_at.get(host, now))
+            self._next_request_at[host] = slot + self.min_request_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def _process_report(self, link: str, prefix: str, source: str) -> List[Dict[str, Any]]:
+        """Download one report page and extract its vulnerable Rust code blocks"""
         contracts = []
         
         try:
-            response = requests.get("https://hacked.slowmist.io/en/", timeout=30)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
+            self._wait_for_host(link)
+            report_response = self.session.get(link, timeout=30)
+            report_response.raise_for_status()
             
-            # Find hack report links
-            report_links = []
-            for link in soup.find_all('a', href=True):
-                href = link['href']
-                if '/hack/' in href:
-                    report_links.append(urljoin("https://hacked.slowmist.io", href))
+            # Unchanged pages skip HTML parsing and vulnerability detection entirely
+            key = hashlib.blake2b(link.encode() + b"\0" + report_response.content, digest_size=16).hexdigest()
+            with self._cache_lock, shelve.open(str(self.block_cache_file)) as cache:
+                cached = cache.get(key)
+            if cached is not None:
+                return cached
             
-            # Process reports
-            for link in report_links[:15]:
-                try:
-                    time.sleep(1)
-                    report_response = requests.get(link, timeout=30)
-                    report_response.raise_for_status()
-                    report_soup = BeautifulSoup(report_response.content, 'html.parser')
-                    
-                    # Extract code blocks
-                    code_blocks = report_soup.find_all(['code', 'pre'])
-                    for block in code_blocks:
-                        code_text = block.get_text().strip()
-                        if self._is_rust_code(code_text):
-                            vulnerabilities = self._detect_vulnerabilities(code_text)
-                            if vulnerabilities:
-                                contract = {
-                                    "contract_id": f"slowmist_{hashlib.md5(link.encode()).hexdigest()[:8]}",
-                                    "source_code": code_text,
-                                    "vulnerabilities": vulnerabilities,
-                                    "severity": ["high"],
-                                    "source": "slowmist",
-                                    "file_path": f"slowmist_{link.split('/')[-1]}.rs",
-                                    "url": link
-                                }
-                                contracts.append(contract)
-                                
-                except Exception as e:
-                    print(f"Error processing {link}: {e}")
-                    continue
-                    
+            # Extract code blocks
+            for code_text in self._extract_code_blocks(report_response.content):
+                if self._is_rust_code(code_text):
+                    vulnerabilities = self._detect_vulnerabilities(code_text)
+                    if vulnerabilities:
+                        contract = {
+                            "contract_id": f"{prefix}_{hashlib.md5(link.encode()).hexdigest()[:8]}",
+                            "source_code": code_text,
+                            "vulnerabilities": vulnerabilities,
+                            "severity": ["high"],
+                            "source": source,
+                            "file_path": f"{prefix}_{link.split('/')[-1]}.rs",
+                            "url": link
+                        }
+                        contracts.append(contract)
+            
+            with self._cache_lock, shelve.open(str(self.block_cache_file)) as cache:
+                cache[key] = contracts
+                        
         except Exception as e:
-            print(f"Error extracting from SlowMist: {e}")
+            print(f"Error processing {link}: {e}")
         
-        print(f"Extracted {len(contracts)} contracts from SlowMist")
+        return contracts
+
+    def _process_reports(self, links: List[str], prefix: str, source: str) -> List[Dict[str, Any]]:
+        """Process report pages in parallel, keeping results in link order"""
+        contracts = []
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for report_contracts in executor.map(lambda link: self._process_report(link, prefix, source), links):
+                self._log_contracts(report_contracts)
+                contracts.extend(report_contracts)
         return contracts
 
     def extract_from_cve_database(self) -> List[Dict[str, Any]]:
@@ -213,7 +271,7 @@ class VulnerableContractExtractor:
                 "resultsPerPage": 100
             }
             
-            response = requests.get(search_url, params=params, timeout=30)
+            response = self.session.get(search_url, params=params, timeout=30)
             response.raise_for_status()
             data = response.json()
             
@@ -225,9 +283,9 @@ class VulnerableContractExtractor:
                 # Look for code snippets in description
                 if 'rust' in description.lower() or 'solana' in description.lower():
                     # Extract any code-like content
-                    code_matches = re.findall(r'```[\s\S]*?```|`[^`]+`', description)
+                    code_matches = self._inline_code_re.findall(description)
                     for code_match in code_matches:
-                        code_text = re.sub(r'```.*?\n?', '', code_match).strip()
+                        code_text = self._fence_marker_re.sub('', code_match).strip()
                         if self._is_rust_code(code_text):
                             vulnerabilities = self._detect_vulnerabilities(code_text)
                             if vulnerabilities:
@@ -245,6 +303,7 @@ class VulnerableContractExtractor:
         except Exception as e:
             print(f"Error extracting from CVE database: {e}")
         
+        self._log_contracts(contracts)
         print(f"Extracted {len(contracts)} contracts from CVE database")
         return contracts
 
@@ -262,7 +321,7 @@ class VulnerableContractExtractor:
                 "per_page": max_issues
             }
             
-            response = requests.get(issues_url, params=params, timeout=30)
+            response = self.session.get(issues_url, params=params, timeout=30)
             response.raise_for_status()
             issues = response.json()
             
@@ -271,7 +330,7 @@ class VulnerableContractExtractor:
                 issue_title = issue.get('title', '')
                 
                 # Extract code blocks from issue body
-                code_blocks = re.findall(r'```(?:rust)?\s*(.*?)```', issue_body, re.DOTALL)
+                code_blocks = self._code_fence_re.findall(issue_body)
                 for code_text in code_blocks:
                     code_text = code_text.strip()
                     if self._is_rust_code(code_text):
@@ -291,36 +350,57 @@ class VulnerableContractExtractor:
         except Exception as e:
             print(f"Error extracting from GitHub issues: {e}")
         
+        self._log_contracts(contracts)
         print(f"Extracted {len(contracts)} contracts from GitHub issues")
         return contracts
 
     def _is_rust_code(self, code: str) -> bool:
         """Check if code appears to be Rust"""
-        rust_indicators = [
-            'use ', 'fn ', 'struct ', 'impl ', 'pub ', 'let ', 'mut ',
-            'anchor_lang', 'solana_program', 'borsh', 'derive',
-            'AccountInfo', 'Program', 'Context', 'Result<()>'
-        ]
+        # Must be reasonably long; checked first so short blocks are never lowercased
+        if len(code) <= 100:
+            return False
         
+        # ...and have at least 3 Rust indicators
         code_lower = code.lower()
-        rust_score = sum(1 for indicator in rust_indicators if indicator in code_lower)
-        
-        # Must have at least 3 Rust indicators and be reasonably long
-        return rust_score >= 3 and len(code) > 100
+        rust_score = 0
+        for indicator in self._rust_indicators:
+            if indicator in code_lower:
+                rust_score += 1
+                if rust_score >= 3:
+                    return True
+        return False
+
+    @staticmethod
+    def _build_pattern_set(patterns) -> Optional[Any]:
+        """Compile all patterns into one RE2 set that matches them in a single pass"""
+        if re2 is None:
+            return None
+        try:
+            pattern_set = re2.Set.SearchSet()
+            for pattern in patterns:
+                pattern_set.Add(f"(?i){pattern}")
+            pattern_set.Compile()
+            return pattern_set
+        except Exception:
+            return None  # Pattern RE2 does not support; use the per-pattern re path
 
     def _detect_vulnerabilities(self, code: str) -> List[str]:
         """Detect vulnerabilities in Rust code"""
-        vulnerabilities = []
-        code_lower = code.lower()
+        found = set()
         
-        for vuln_type, patterns in self.vulnerability_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, code_lower):
-                    if vuln_type not in vulnerabilities:
-                        vulnerabilities.append(vuln_type)
-                    break
+        # Case-insensitive patterns, so no lowercased copy of the block is needed
+        if self._pattern_set is not None:
+            # Indices follow the order the patterns were added, i.e. _compiled_patterns;
+            # Match returns None rather than an empty list when nothing matches
+            for index in self._pattern_set.Match(code) or ():
+                found |= self._compiled_patterns[index][1]
+        else:
+            # Skip patterns whose vulnerability types have all been found already
+            for pattern, types in self._compiled_patterns:
+                if not types <= found and pattern.search(code):
+                    found |= types
         
-        return vulnerabilities
+        return [vuln_type for vuln_type in self.vulnerability_patterns if vuln_type in found]
 
     def extract_all_sources(self) -> List[Dict[str, Any]]:
         """Extract from all available sources"""
@@ -342,18 +422,34 @@ class VulnerableContractExtractor:
             ("project-serum", "anchor"),
         ]
         
-        for repo_owner, repo_name in github_repos:
-            all_contracts.extend(self.extract_from_github_issues(repo_owner, repo_name))
-        
-        for source_func in sources:
-            try:
-                contracts = source_func()
-                all_contracts.extend(contracts)
-            except Exception as e:
-                print(f"Error in {source_func.__name__}: {e}")
-                continue
+        # Contracts are appended here as each report or source finishes, in completion order
+        crawl_log_file = self.output_dir / "extracted_vulnerable_contracts.jsonl"
+        self._crawl_log = open(crawl_log_file, 'wb')
+        try:
+            # Every source is a different host, so run them all at once;
+            # results are still collected in a fixed order
+            with ThreadPoolExecutor(max_workers=len(sources) + len(github_repos)) as executor:
+                github_futures = [
+                    executor.submit(self.extract_from_github_issues, repo_owner, repo_name)
+                    for repo_owner, repo_name in github_repos
+                ]
+                source_futures = [(source_func, executor.submit(source_func)) for source_func in sources]
+            
+                for future in github_futures:
+                    all_contracts.extend(future.result())
+            
+                for source_func, future in source_futures:
+                    try:
+                        contracts = future.result()
+                        all_contracts.extend(contracts)
+                    except Exception as e:
+                        print(f"Error in {source_func.__name__}: {e}")
+                        continue
+        finally:
+            self._crawl_log.close()
+            self._crawl_log = None
         
-        # Save extracted contracts
+        # Save extracted contracts as a JSON array, in source order, for merge_all_datasets.py
         output_file = self.output_dir / "extracted_vulnerable_contracts.json"
         with open(output_file, 'w', encoding='utf-8') as f:
             json.dump(all_contracts, f, indent=2, ensure_ascii=False)
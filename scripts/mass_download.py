@@ -6,10 +6,28 @@ Mass download all available Rust/Solana datasets from GitHub and Hugging Face.
 import subprocess
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from huggingface_hub import list_datasets, snapshot_download
 import requests
 
+# Dataset files only; skips model weights and other large artifacts
+HF_ALLOW_PATTERNS = ["*.json", "*.jsonl", "*.csv", "*.parquet", "*.md"]
+
+def clone_repo(repo):
+    """Shallow-clone a single repository into datasets/raw"""
+    try:
+        repo_name = repo.split('/')[-1].replace('.git', '')
+        if not os.path.exists(f"datasets/raw/{repo_name}"):
+            print(f"Cloning {repo_name}...")
+            # Only the latest snapshot is scanned, so skip history and other branches
+            subprocess.run(["git", "clone", "--depth=1", "--single-branch", repo, f"datasets/raw/{repo_name}"], 
+                         capture_output=True, timeout=300)
+        else:
+            print(f"Already exists: {repo_name}")
+    except Exception as e:
+        print(f"Failed to clone {repo}: {e}")
+
 def clone_github_repos():
     """Clone all relevant GitHub repositories"""
     repos = [
@@ -43,17 +61,8 @@ def clone_github_repos():
     ]
     
     print("Cloning GitHub repositories...")
-    for repo in repos:
-        try:
-            repo_name = repo.split('/')[-1].replace('.git', '')
-            if not os.path.exists(f"datasets/raw/{repo_name}"):
-                print(f"Cloning {repo_name}...")
-                subprocess.run(["git", "clone", repo, f"datasets/raw/{repo_name}"], 
-                             capture_output=True, timeout=300)
-            else:
-                print(f"Already exists: {repo_name}")
-        except Exception as e:
-            print(f"Failed to clone {repo}: {e}")
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(clone_repo, repos))
 
 def download_huggingface_datasets():
     """Download all relevant Hugging Face datasets"""
@@ -75,7 +84,8 @@ def download_huggingface_datasets():
         try:
             print(f"Downloading {dataset}...")
             snapshot_download(repo_id=dataset, repo_type="dataset", 
-                            local_dir=f"datasets/raw/hf_{dataset.replace('/', '_')}")
+                            local_dir=f"datasets/raw/hf_{dataset.replace('/', '_')}",
+                            allow_patterns=HF_ALLOW_PATTERNS)
         except Exception as e:
             print(f"Failed to download {dataset}: {e}")
 
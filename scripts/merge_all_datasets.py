@@ -6,8 +6,60 @@ Merge all collected datasets into a unified format for training.
 import json
 import os
 from pathlib import Path
-from typing import List, Dict, Any
+from itertools import repeat
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 import hashlib
+import sqlite3
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+def source_digest(source_bytes: bytes) -> bytes:
+    """16-byte content digest for duplicate detection (blake3, or blake2b without it)"""
+    if blake3 is not None:
+        return blake3.blake3(source_bytes).digest()[:16]
+    return hashlib.blake2b(source_bytes, digest_size=16).digest()
+
+
+def encode_contract(contract: Dict[str, Any]) -> bytes:
+    """Compact JSON encoding of a contract (orjson when available)"""
+    if orjson is not None:
+        return orjson.dumps(contract)
+    return json.dumps(contract, ensure_ascii=False).encode('utf-8')
+
+
+INDEX_BATCH_SIZE = 1000
+
+# Bumped whenever the merge index layout changes; an index with another version is rebuilt
+INDEX_SCHEMA_VERSION = 2
+
+# blake3/hashlib release the GIL while hashing, so digests of a batch are computed on threads,
+# a chunk of sources per task to keep executor overhead small next to the hashing itself
+HASH_WORKERS = os.cpu_count() or 1
+HASH_CHUNK_SIZE = 256
+
+
+def digest_sources(sources: List[bytes]) -> List[bytes]:
+    """source_digest for each encoded source in a chunk"""
+    return [source_digest(source) for source in sources]
+
+REQUIRED_FIELDS = ('contract_id', 'source_code', 'vulnerabilities', 'severity', 'source')
 
 
 class DatasetMerger:
@@ -16,149 +68,224 @@ class DatasetMerger:
         self.raw_dir = self.datasets_dir / "raw"
         self.processed_dir = self.datasets_dir / "processed"
         
+        self.index_file = self.processed_dir / "merged.db"
+        
         # Ensure directories exist
         self.processed_dir.mkdir(parents=True, exist_ok=True)
 
-    def load_json_dataset(self, file_path: Path) -> List[Dict[str, Any]]:
-        """Load a JSON dataset file"""
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error loading {file_path}: {e}")
-            return []
-
-    def deduplicate_contracts(self, contracts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Remove duplicate contracts based on source code hash"""
-        seen_hashes = set()
-        unique_contracts = []
-        
-        for contract in contracts:
-            # Create hash of source code
-            source_code = contract.get('source_code', '')
-            code_hash = hashlib.md5(source_code.encode('utf-8')).hexdigest()
-            
-            if code_hash not in seen_hashes:
-                seen_hashes.add(code_hash)
-                unique_contracts.append(contract)
+    def load_json_dataset(self, file_path: Path) -> Iterator[Dict[str, Any]]:
+        """Stream contracts from a JSON Lines or JSON array dataset file"""
+        loads = orjson.loads if orjson is not None else json.loads
+        with open(file_path, 'rb') as f:
+            if file_path.suffix == '.jsonl':
+                for line in f:
+                    if line.strip():
+                        yield loads(line)
+            elif ijson is not None:
+                # Parse array elements incrementally; floats rather than Decimals so they re-encode
+                yield from ijson.items(f, 'item', use_float=True)
             else:
-                print(f"Removed duplicate: {contract.get('contract_id', 'unknown')}")
-        
-        return unique_contracts
+                yield from loads(f.read())
 
-    def validate_contract(self, contract: Dict[str, Any]) -> bool:
-        """Validate that a contract has required fields"""
-        required_fields = ['contract_id', 'source_code', 'vulnerabilities', 'severity', 'source']
-        
-        for field in required_fields:
-            if field not in contract:
-                print(f"Invalid contract missing {field}: {contract.get('contract_id', 'unknown')}")
-                return False
-        
-        # Check that source code is not empty
-        if not contract['source_code'].strip():
-            print(f"Invalid contract with empty source code: {contract['contract_id']}")
-            return False
-        
-        return True
-
-    def merge_all_datasets(self) -> str:
-        """Merge all available datasets"""
-        print("Starting dataset merge...")
-        
-        all_contracts = []
-        
-        # Load existing unified dataset
-        unified_file = self.processed_dir / "unified_rust_dataset.json"
+    def source_files(self) -> Iterator[Tuple[Path, str]]:
+        """Yield (path, description) for every existing source file, in merge order"""
+        # Existing unified dataset (JSON Lines from aggregate_rust_datasets.py, or legacy JSON)
+        unified_file = self.processed_dir / "unified_rust_dataset.jsonl"
+        if not unified_file.exists():
+            unified_file = self.processed_dir / "unified_rust_dataset.json"
         if unified_file.exists():
-            existing_contracts = self.load_json_dataset(unified_file)
-            all_contracts.extend(existing_contracts)
-            print(f"Loaded {len(existing_contracts)} existing contracts")
+            yield unified_file, "existing contracts"
         
-        # Load manual contracts
+        # Manual contracts
         manual_file = self.raw_dir / "manual_vulnerable_contracts.json"
         if manual_file.exists():
-            manual_contracts = self.load_json_dataset(manual_file)
-            all_contracts.extend(manual_contracts)
-            print(f"Loaded {len(manual_contracts)} manual contracts")
+            yield manual_file, "manual contracts"
         
-        # Load extracted contracts
+        # Extracted contracts
         extracted_file = self.raw_dir / "extracted_vulnerable_contracts.json"
         if extracted_file.exists():
-            extracted_contracts = self.load_json_dataset(extracted_file)
-            all_contracts.extend(extracted_contracts)
-            print(f"Loaded {len(extracted_contracts)} extracted contracts")
+            yield extracted_file, "extracted contracts"
         
-        # Load any other JSON files in raw directory
+        # Any other JSON files in raw directory
         for json_file in self.raw_dir.glob("*.json"):
             if json_file.name not in ["manual_vulnerable_contracts.json", "extracted_vulnerable_contracts.json"]:
-                additional_contracts = self.load_json_dataset(json_file)
-                all_contracts.extend(additional_contracts)
-                print(f"Loaded {len(additional_contracts)} contracts from {json_file.name}")
-        
-        print(f"Total contracts before deduplication: {len(all_contracts)}")
+                yield json_file, f"contracts from {json_file.name}"
+
+    def open_index(self) -> sqlite3.Connection:
+        """Open the merge index: each source file's contracts keyed by source digest, plus file stamps"""
+        con = sqlite3.connect(str(self.index_file))
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        if con.execute("PRAGMA user_version").fetchone()[0] != INDEX_SCHEMA_VERSION:
+            con.executescript("DROP TABLE IF EXISTS contracts; DROP TABLE IF EXISTS sources;")
+            con.execute(f"PRAGMA user_version = {INDEX_SCHEMA_VERSION}")
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS contracts "
+            "(path TEXT NOT NULL, hash BLOB NOT NULL, body BLOB NOT NULL, PRIMARY KEY (path, hash))"
+        )
+        con.execute("CREATE TABLE IF NOT EXISTS sources (path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER)")
+        # Merge position of each current source file; duplicates resolve to the earliest one
+        con.execute("CREATE TEMP TABLE merge_order (path TEXT PRIMARY KEY, pos INTEGER NOT NULL)")
+        return con
+
+    def index_contracts(self, con: sqlite3.Connection, path: str, contracts: Iterable[Dict[str, Any]]) -> Tuple[int, int, int]:
+        """Insert a source file's valid contracts, once per digest; returns (total, valid, added) counts"""
+        total_count = valid_count = 0
+        changes_before = con.total_changes
+        batch = []
         
-        # Validate contracts
-        valid_contracts = [c for c in all_contracts if self.validate_contract(c)]
-        print(f"Valid contracts: {len(valid_contracts)}")
+        with ThreadPoolExecutor(max_workers=HASH_WORKERS) as executor:
+            for contract in contracts:
+                total_count += 1
+                if not self.validate_contract(contract):
+                    continue
+                valid_count += 1
+                batch.append(contract)
+                if len(batch) >= INDEX_BATCH_SIZE:
+                    self._insert_batch(con, path, batch, executor)
+                    batch = []
+            if batch:
+                self._insert_batch(con, path, batch, executor)
         
-        # Deduplicate
-        unique_contracts = self.deduplicate_contracts(valid_contracts)
-        print(f"Unique contracts after deduplication: {len(unique_contracts)}")
+        return total_count, valid_count, con.total_changes - changes_before
+
+    def _insert_batch(self, con: sqlite3.Connection, path: str, batch: List[Dict[str, Any]], executor: ThreadPoolExecutor):
+        """Hash a batch of contracts in parallel and insert the ones not already indexed for path"""
+        sources = [contract['source_code'].encode('utf-8') for contract in batch]
+        chunks = [sources[i:i + HASH_CHUNK_SIZE] for i in range(0, len(sources), HASH_CHUNK_SIZE)]
+        # Raw 16-byte digest of the source code keys contracts within a file; repeats are ignored
+        digests = [digest for chunk in executor.map(digest_sources, chunks) for digest in chunk]
+        con.executemany(
+            "INSERT OR IGNORE INTO contracts VALUES (?, ?, ?)",
+            zip(repeat(path), digests, map(encode_contract, batch))
+        )
+
+    def export_contracts(self, con: sqlite3.Connection, f) -> Iterator[Dict[str, Any]]:
+        """Write each unique contract as a JSON line to binary file f, yielding it decoded"""
+        loads = orjson.loads if orjson is not None else json.loads
+        # First occurrence of each digest in merge order (file position, then order within the file)
+        query = """
+            SELECT body FROM (
+                SELECT c.body, o.pos, c.rowid AS seq,
+                       ROW_NUMBER() OVER (PARTITION BY c.hash ORDER BY o.pos, c.rowid) AS occurrence
+                FROM contracts c JOIN merge_order o ON o.path = c.path
+            )
+            WHERE occurrence = 1
+            ORDER BY pos, seq
+        """
+        for (body,) in con.execute(query):
+            f.write(body + b"\n")
+            yield loads(body)
+
+    def validate_contract(self, contract: Dict[str, Any]) -> bool:
+        """Validate that a contract has required fields and non-empty source code"""
+        # Invalid contracts are only counted (see merge_all_datasets), not reported one by one
+        return all(field in contract for field in REQUIRED_FIELDS) and bool(contract['source_code'].strip())
+
+    def merge_all_datasets(self, rebuild: bool = False) -> str:
+        """Merge new and changed datasets into the index and export the merged dataset"""
+        print("Starting dataset merge...")
         
-        # Save merged dataset
-        output_file = self.processed_dir / "unified_rust_dataset_merged.json"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(unique_contracts, f, indent=2, ensure_ascii=False)
+        if rebuild:
+            for suffix in ("", "-wal", "-shm"):
+                Path(f"{self.index_file}{suffix}").unlink(missing_ok=True)
         
-        # Generate statistics
-        stats = self.generate_statistics(unique_contracts)
+        total_count = valid_count = added_count = 0
+        output_file = self.processed_dir / "unified_rust_dataset_merged.jsonl"
         stats_file = self.processed_dir / "merged_dataset_statistics.json"
+        
+        with closing(self.open_index()) as con:
+            source_paths = []
+            for file_path, description in self.source_files():
+                path = str(file_path)
+                source_paths.append(path)
+                
+                # Only files changed since the last merge are re-read
+                stat = file_path.stat()
+                indexed = con.execute("SELECT mtime_ns, size FROM sources WHERE path = ?", (path,)).fetchone()
+                if indexed == (stat.st_mtime_ns, stat.st_size):
+                    print(f"Unchanged since last merge: {file_path.name}")
+                    continue
+                
+                # One transaction per source file, replacing whatever it contributed before and
+                # streamed into the index in batches, so an interrupted merge never records a partial file
+                try:
+                    with con:
+                        con.execute("DELETE FROM contracts WHERE path = ?", (path,))
+                        file_total, file_valid, file_added = self.index_contracts(con, path, self.load_json_dataset(file_path))
+                        con.execute(
+                            "INSERT OR REPLACE INTO sources VALUES (?, ?, ?)",
+                            (path, stat.st_mtime_ns, stat.st_size)
+                        )
+                except Exception as e:
+                    # Rolled back and not stamped, so the file is retried next run; its last good contracts stay merged
+                    print(f"Error loading {file_path}: {e}")
+                    continue
+                print(f"Loaded {file_total} {description}")
+                total_count += file_total
+                valid_count += file_valid
+                added_count += file_added
+            
+            # Forget source files that no longer exist
+            with con:
+                con.executemany("INSERT INTO merge_order VALUES (?, ?)", ((path, pos) for pos, path in enumerate(source_paths)))
+                con.execute("DELETE FROM contracts WHERE path NOT IN (SELECT path FROM merge_order)")
+                con.execute("DELETE FROM sources WHERE path NOT IN (SELECT path FROM merge_order)")
+            
+            print(f"Total contracts before deduplication: {total_count}")
+            print(f"Valid contracts: {valid_count}")
+            print(f"Indexed contracts from changed files: {added_count}")
+            print(f"Skipped {total_count - valid_count} invalid and {valid_count - added_count} duplicate contracts within files")
+            
+            # Save merged dataset as JSON Lines so training can stream it,
+            # computing statistics from the same pass over the index
+            with open(output_file, 'wb') as f:
+                stats = self.generate_statistics(self.export_contracts(con, f))
+            print(f"Unique contracts after deduplication: {stats['total_contracts']}")
+        
+        # Save statistics
         with open(stats_file, 'w', encoding='utf-8') as f:
             json.dump(stats, f, indent=2, ensure_ascii=False)
         
         print(f"\n✅ Dataset merge complete!")
-        print(f"   Total contracts: {len(unique_contracts)}")
+        print(f"   Total contracts: {stats['total_contracts']}")
         print(f"   Output file: {output_file}")
         print(f"   Statistics: {stats_file}")
         
         return str(output_file)
 
-    def generate_statistics(self, contracts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def generate_statistics(self, contracts: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
         """Generate comprehensive dataset statistics"""
-        total_contracts = len(contracts)
-        vulnerable_contracts = sum(1 for c in contracts if c["vulnerabilities"])
-        safe_contracts = total_contracts - vulnerable_contracts
-        
-        # Count by vulnerability type
-        vuln_counts = {}
-        for contract in contracts:
-            for vuln in contract["vulnerabilities"]:
-                vuln_counts[vuln] = vuln_counts.get(vuln, 0) + 1
+        total_contracts = 0
+        vulnerable_contracts = 0
+        total_vulns = 0
+        vuln_counts = Counter()
+        source_counts = Counter()
+        severity_counts = Counter()
         
-        # Count by source
-        source_counts = {}
+        # Count vulnerabilities, sources and severities in a single pass
         for contract in contracts:
-            source = contract["source"]
-            source_counts[source] = source_counts.get(source, 0) + 1
+            total_contracts += 1
+            vulnerabilities = contract["vulnerabilities"]
+            if vulnerabilities:
+                vulnerable_contracts += 1
+            total_vulns += len(vulnerabilities)
+            vuln_counts.update(vulnerabilities)
+            source_counts[contract["source"]] += 1
+            severity_counts.update(contract["severity"])
         
-        # Count by severity
-        severity_counts = {}
-        for contract in contracts:
-            for severity in contract["severity"]:
-                severity_counts[severity] = severity_counts.get(severity, 0) + 1
+        safe_contracts = total_contracts - vulnerable_contracts
         
         # Calculate average vulnerabilities per contract
-        total_vulns = sum(len(c["vulnerabilities"]) for c in contracts)
         avg_vulns_per_contract = total_vulns / total_contracts if total_contracts > 0 else 0
         
         return {
             "total_contracts": total_contracts,
             "vulnerable_contracts": vulnerable_contracts,
             "safe_contracts": safe_contracts,
-            "vulnerability_distribution": vuln_counts,
-            "source_distribution": source_counts,
-            "severity_distribution": severity_counts,
+            "vulnerability_distribution": dict(vuln_counts),
+            "source_distribution": dict(source_counts),
+            "severity_distribution": dict(severity_counts),
             "average_vulnerabilities_per_contract": round(avg_vulns_per_contract, 2),
             "vulnerability_types": list(vuln_counts.keys()),
             "sources": list(source_counts.keys())
@@ -171,11 +298,12 @@ def main():
     parser = argparse.ArgumentParser(description="Merge all collected datasets")
     parser.add_argument("--datasets-dir", type=str, default="datasets", help="Datasets directory")
     parser.add_argument("--output-name", type=str, default="unified_rust_dataset_merged", help="Output filename")
+    parser.add_argument("--rebuild", action="store_true", help="Discard the merge index and re-merge every source")
     
     args = parser.parse_args()
     
     merger = DatasetMerger(args.datasets_dir)
-    output_file = merger.merge_all_datasets()
+    output_file = merger.merge_all_datasets(rebuild=args.rebuild)
     
     print(f"\n🎉 Merged dataset ready for training!")
     print(f"   Use: python ml-engine/train.py --data {output_file}")
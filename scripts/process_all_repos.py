@@ -5,115 +5,365 @@ Process all downloaded repositories to extract Rust/Solana contracts.
 
 import os
 import json
+import mmap
 import re
+import shelve
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, repeat
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 import hashlib
 
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+_REGEX_METACHARS = frozenset(".^$*+?{}[]|()")
+
+# Larger files are almost always generated (IDL, embedded JSON); only the head of the rest is scanned
+MAX_RUST_FILE_SIZE = 2 * 1024 * 1024
+MAX_RUST_READ_BYTES = 512 * 1024
+
+# Files above this are mapped and filtered as bytes, so non-Solana ones are never decoded
+MMAP_MIN_SIZE = 64 * 1024
+
+
+def pattern_literal(pattern: str) -> Optional[str]:
+    """Return the plain string a regex matches if it has no metacharacters, else None"""
+    chars = []
+    escaped = False
+    for ch in pattern:
+        if escaped:
+            # \s, \d, \b etc. are classes/assertions, not literals
+            if ch.isalnum():
+                return None
+            chars.append(ch)
+            escaped = False
+        elif ch == "\\":
+            escaped = True
+        elif ch in _REGEX_METACHARS:
+            return None
+        else:
+            chars.append(ch)
+    return None if escaped else "".join(chars)
+
+# Vulnerability patterns, matched case-sensitively against lowercased code; the capitalised
+# entries (AccountInfo, PDA) therefore never fire, as in the original detector
+VULNERABILITY_PATTERNS = {
+    "unsafe_code": [r"unsafe\s*\{", r"std::ptr::", r"transmute", r"raw.*pointer"],
+    "account_validation": [r"#\[account\(\)\]", r"AccountInfo", r"require!.*account"],
+    "signature_verification": [r"is_signer", r"require!.*signer", r"msg\.sender"],
+    "integer_overflow": [r"\.wrapping_add", r"\.wrapping_sub", r"checked_add", r"checked_sub"],
+    "panic_handling": [r"panic!", r"unwrap\(\)", r"expect\(", r"unreachable!"],
+    "program_derivation": [r"find_program_address", r"create_program_address", r"try_find_program_address"],
+    "seed_validation": [r"seeds.*b\"", r"PDA", r"program_derived_address"],
+    "authority_validation": [r"authority", r"owner", r"admin", r"only_owner"],
+    "instruction_validation": [r"instruction", r"cpi", r"invoke", r"invoke_signed"],
+    "data_validation": [r"deserialize", r"serialize", r"borsh", r"anchor_lang"],
+    "rent_exemption": [r"rent", r"lamports", r"minimum_balance", r"rent_exempt"],
+    "token_program": [r"token_program", r"spl_token", r"transfer", r"mint"],
+    "cross_program_invocation": [r"invoke", r"invoke_signed", r"cpi", r"cross_program"],
+    "pda_validation": [r"program_derived_address", r"find_program_address", r"seeds"]
+}
+
+SOLANA_INDICATORS = [
+    'anchor_lang', 'solana_program', 'borsh', 'AccountInfo', 'Program',
+    'Context', 'Result<()>', 'pubkey', 'lamports', 'rent', 'system_program',
+    'token_program', 'associated_token', 'program_derived_address'
+]
+
+# Rust files handed to each process pool worker per round trip
+RUST_FILE_CHUNK_SIZE = 64
+
+# Bumped whenever classification changes, so cached per-file results from older runs are discarded
+FILE_CACHE_VERSION = 2
+FILE_CACHE_VERSION_KEY = "__version__"
+
+# Record fields that may hold source code in Hugging Face datasets, in order of preference
+CODE_FIELDS = ('code', 'source_code', 'text', 'content')
+PARQUET_BATCH_SIZE = 8192
+
+# Build output and vendored trees pruned while walking a repository (hidden dirs are always skipped)
+SKIP_DIRS = frozenset({'target', 'node_modules', 'dist', 'build'})
+
+
+def iter_rust_files(root: Path) -> Iterator[Path]:
+    """Yield .rs files under root, pruning hidden and SKIP_DIRS directories during descent"""
+    stack = [root]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                name = entry.name
+                if name.startswith('.') or name in SKIP_DIRS:
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif name.endswith('.rs'):
+                    yield Path(entry.path)
+
+
+def write_json(path: Path, data: Any) -> None:
+    """Write data as indented JSON, using orjson when available"""
+    if orjson is not None:
+        Path(path).write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+def write_jsonl(f, contracts: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Write each contract as one JSON line to binary file f, passing it through"""
+    for contract in contracts:
+        if orjson is not None:
+            f.write(orjson.dumps(contract) + b"\n")
+        else:
+            f.write((json.dumps(contract, ensure_ascii=False) + "\n").encode("utf-8"))
+        yield contract
+
+
+def short_digest(text: str) -> str:
+    """Fast 8-hex-char digest for contract ids (xxh3, or blake2b without xxhash)"""
+    if xxhash is not None:
+        return xxhash.xxh3_64_hexdigest(text)[:8]
+    return hashlib.blake2b(text.encode(), digest_size=4).hexdigest()
+
+
+def stream_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    """Yield one record per JSONL line, skipping blank and malformed lines"""
+    loads = orjson.loads if orjson is not None else json.loads
+    with open(path, 'rb') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield loads(line)
+            except ValueError as e:
+                print(f"Skipping malformed line {line_no} in {path.name}: {e}")
+
+
+def iter_parquet_records(data_file: Path) -> Iterator[Dict[str, Any]]:
+    """Stream Parquet rows in record batches, reading only the code columns"""
+    import pyarrow.parquet as pq
+    
+    parquet_file = pq.ParquetFile(data_file)
+    columns = [c for c in CODE_FIELDS if c in parquet_file.schema_arrow.names]
+    for batch in parquet_file.iter_batches(batch_size=PARQUET_BATCH_SIZE, columns=columns):
+        yield from batch.to_pylist()
+
+
+def build_code_scanner():
+    """Split the patterns into an Aho-Corasick automaton of literals plus residual regexes"""
+    if ahocorasick is None:
+        return None, {
+            vuln_type: [re.compile(pattern) for pattern in patterns]
+            for vuln_type, patterns in VULNERABILITY_PATTERNS.items()
+        }
+    
+    literal_vulns: Dict[str, List[str]] = {}
+    residual: Dict[str, List[Any]] = {}
+    for vuln_type, patterns in VULNERABILITY_PATTERNS.items():
+        for pattern in patterns:
+            literal = pattern_literal(pattern)
+            if literal is None:
+                residual.setdefault(vuln_type, []).append(re.compile(pattern))
+            else:
+                literal_vulns.setdefault(literal, []).append(vuln_type)
+    
+    automaton = ahocorasick.Automaton()
+    for literal, vuln_types in literal_vulns.items():
+        automaton.add_word(literal, tuple(vuln_types))
+    automaton.make_automaton()
+    return automaton, residual
+
+
+# Built at import so process pool workers compile them once, not per task
+CODE_AUTOMATON, RESIDUAL_PATTERNS = build_code_scanner()
+
+# Plain substring search (memmem-backed) is far faster than a case-insensitive regex alternation.
+# Indicators are looked up in lowercased content, so the capitalised ones (AccountInfo, Program,
+# Context, Result<()>) never matched in the original check and are left out here too
+SOLANA_NEEDLES = tuple(indicator for indicator in SOLANA_INDICATORS if indicator == indicator.lower())
+SOLANA_BYTE_NEEDLES = tuple(needle.encode() for needle in SOLANA_NEEDLES)
+
+
+def is_solana_rust(content_lower: str) -> bool:
+    """Check if already-lowercased Rust code is Solana-related"""
+    return any(needle in content_lower for needle in SOLANA_NEEDLES)
+
+
+def is_solana_rust_mapped(mm: mmap.mmap, end: int) -> bool:
+    """Check the first end bytes of a mapped file for Solana indicators"""
+    # Most Solana files spell an indicator in lowercase, found in place without copying
+    if any(mm.find(needle, 0, end) != -1 for needle in SOLANA_BYTE_NEEDLES):
+        return True
+    head = mm[:end].lower()
+    return any(head.find(needle) != -1 for needle in SOLANA_BYTE_NEEDLES)
+
+
+def detect_vulnerabilities(content_lower: str) -> List[str]:
+    """Detect vulnerabilities in already-lowercased Rust code"""
+    hits = set()
+    
+    # One pass for every literal pattern, then only the real regexes
+    if CODE_AUTOMATON is not None:
+        for _, vuln_types in CODE_AUTOMATON.iter(content_lower):
+            hits.update(vuln_types)
+    for vuln_type, patterns in RESIDUAL_PATTERNS.items():
+        if vuln_type not in hits and any(pattern.search(content_lower) for pattern in patterns):
+            hits.add(vuln_type)
+    
+    return [vuln_type for vuln_type in VULNERABILITY_PATTERNS if vuln_type in hits]
+
+
+def process_rust_file(file_path: Path, repo_name: str, raw_dir: Path) -> Optional[Dict[str, Any]]:
+    """Process a single Rust file"""
+    try:
+        size = os.path.getsize(file_path)
+        if size > MAX_RUST_FILE_SIZE:
+            print(f"Skipping {file_path}: {size / (1024 * 1024):.1f} MB, likely generated")
+            return None
+        
+        if size > MMAP_MIN_SIZE:
+            with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if not is_solana_rust_mapped(mm, MAX_RUST_READ_BYTES):
+                    return None
+                content = mm[:MAX_RUST_READ_BYTES].decode('utf-8', errors='ignore')
+            if '\r' in content:
+                # Match the universal newline handling of text-mode reads
+                content = content.replace('\r\n', '\n').replace('\r', '\n')
+            content_lower = content.lower()
+        else:
+            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                content = f.read()
+            
+            content_lower = content.lower()
+            if not is_solana_rust(content_lower):
+                return None
+        
+        # One lowercased copy serves both the filter and the pattern scan
+        vulnerabilities = detect_vulnerabilities(content_lower)
+        
+        # Determine if it's vulnerable or safe
+        is_vulnerable = len(vulnerabilities) > 0
+        
+        contract = {
+            "contract_id": f"{repo_name}_{short_digest(str(file_path))}",
+            "source_code": content,
+            "vulnerabilities": vulnerabilities if is_vulnerable else [],
+            "severity": ["high"] if is_vulnerable else [],
+            "source": f"repo_{repo_name}",
+            "file_path": str(file_path.relative_to(raw_dir)),
+            "repo": repo_name
+        }
+        
+        return contract
+        
+    except Exception as e:
+        print(f"Error processing {file_path}: {e}")
+        return None
+
+
 class RepositoryProcessor:
-    def __init__(self, raw_dir: str = "datasets/raw", output_file: str = "datasets/processed/all_extracted_contracts.json"):
+    def __init__(self, raw_dir: str = "datasets/raw", output_file: str = "datasets/processed/all_extracted_contracts.jsonl"):
         self.raw_dir = Path(raw_dir)
         self.output_file = Path(output_file)
         self.output_file.parent.mkdir(parents=True, exist_ok=True)
         
-        self.contracts = []
-        
-        # Vulnerability patterns
-        self.vulnerability_patterns = {
-            "unsafe_code": [r"unsafe\s*\{", r"std::ptr::", r"transmute", r"raw.*pointer"],
-            "account_validation": [r"#\[account\(\)\]", r"AccountInfo", r"require!.*account"],
-            "signature_verification": [r"is_signer", r"require!.*signer", r"msg\.sender"],
-            "integer_overflow": [r"\.wrapping_add", r"\.wrapping_sub", r"checked_add", r"checked_sub"],
-            "panic_handling": [r"panic!", r"unwrap\(\)", r"expect\(", r"unreachable!"],
-            "program_derivation": [r"find_program_address", r"create_program_address", r"try_find_program_address"],
-            "seed_validation": [r"seeds.*b\"", r"PDA", r"program_derived_address"],
-            "authority_validation": [r"authority", r"owner", r"admin", r"only_owner"],
-            "instruction_validation": [r"instruction", r"cpi", r"invoke", r"invoke_signed"],
-            "data_validation": [r"deserialize", r"serialize", r"borsh", r"anchor_lang"],
-            "rent_exemption": [r"rent", r"lamports", r"minimum_balance", r"rent_exempt"],
-            "token_program": [r"token_program", r"spl_token", r"transfer", r"mint"],
-            "cross_program_invocation": [r"invoke", r"invoke_signed", r"cpi", r"cross_program"],
-            "pda_validation": [r"program_derived_address", r"find_program_address", r"seeds"]
-        }
-
-    def is_rust_file(self, file_path: Path) -> bool:
-        """Check if file is a Rust file"""
-        return file_path.suffix == '.rs' and not any(part.startswith('.') for part in file_path.parts)
+        # Per-file results keyed by path and stamped with (mtime_ns, size), reused on later runs
+        self.cache_file = self.output_file.parent / "file_cache"
+        self._file_cache = None
+        
+        self.vulnerability_patterns = VULNERABILITY_PATTERNS
 
     def is_solana_rust(self, content: str) -> bool:
         """Check if Rust code is Solana-related"""
-        solana_indicators = [
-            'anchor_lang', 'solana_program', 'borsh', 'AccountInfo', 'Program',
-            'Context', 'Result<()>', 'pubkey', 'lamports', 'rent', 'system_program',
-            'token_program', 'associated_token', 'program_derived_address'
-        ]
-        
-        content_lower = content.lower()
-        return any(indicator in content_lower for indicator in solana_indicators)
+        return is_solana_rust(content.lower())
 
     def detect_vulnerabilities(self, content: str) -> List[str]:
         """Detect vulnerabilities in Rust code"""
-        vulnerabilities = []
-        content_lower = content.lower()
-        
-        for vuln_type, patterns in self.vulnerability_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, content_lower):
-                    if vuln_type not in vulnerabilities:
-                        vulnerabilities.append(vuln_type)
-                    break
-        
-        return vulnerabilities
+        return detect_vulnerabilities(content.lower())
 
-    def process_rust_file(self, file_path: Path, repo_name: str) -> Dict[str, Any]:
+    def process_rust_file(self, file_path: Path, repo_name: str) -> Optional[Dict[str, Any]]:
         """Process a single Rust file"""
-        try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-            
-            if not self.is_solana_rust(content):
-                return None
-            
-            vulnerabilities = self.detect_vulnerabilities(content)
-            
-            # Determine if it's vulnerable or safe
-            is_vulnerable = len(vulnerabilities) > 0
-            
-            contract = {
-                "contract_id": f"{repo_name}_{hashlib.md5(str(file_path).encode()).hexdigest()[:8]}",
-                "source_code": content,
-                "vulnerabilities": vulnerabilities if is_vulnerable else [],
-                "severity": ["high"] if is_vulnerable else [],
-                "source": f"repo_{repo_name}",
-                "file_path": str(file_path.relative_to(self.raw_dir)),
-                "repo": repo_name
-            }
-            
-            return contract
-            
-        except Exception as e:
-            print(f"Error processing {file_path}: {e}")
-            return None
+        return process_rust_file(file_path, repo_name, self.raw_dir)
 
-    def process_repository(self, repo_path: Path) -> int:
-        """Process all Rust files in a repository"""
+    def process_repository(self, repo_path: Path, executor: Optional[ProcessPoolExecutor] = None) -> Iterator[Dict[str, Any]]:
+        """Yield the Solana contracts in a repository, scanning files across worker processes"""
         repo_name = repo_path.name
         print(f"Processing repository: {repo_name}")
         
+        rust_files = list(iter_rust_files(repo_path))
+        if executor is None:
+            with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+                yield from self._collect_contracts(executor, rust_files, repo_name)
+        else:
+            yield from self._collect_contracts(executor, rust_files, repo_name)
+
+    def _collect_contracts(self, executor: ProcessPoolExecutor, rust_files: List[Path], repo_name: str) -> Iterator[Dict[str, Any]]:
+        """Scan rust_files on the executor and yield the Solana contracts, reusing cached results"""
+        cache = self._file_cache if self._file_cache is not None else {}
+        stamps = {}
+        cached = {}
+        for rust_file in rust_files:
+            try:
+                st = os.stat(rust_file)
+            except OSError:
+                continue
+            stamps[rust_file] = (st.st_mtime_ns, st.st_size)
+            entry = cache.get(str(rust_file))
+            if entry is not None and entry[0] == stamps[rust_file]:
+                cached[rust_file] = entry[1]
+        
+        # Only new or changed files go to the workers; map keeps them in file order
+        pending = [f for f in rust_files if f not in cached]
+        results = executor.map(process_rust_file, pending, repeat(repo_name), repeat(self.raw_dir),
+                               chunksize=RUST_FILE_CHUNK_SIZE)
+        
         count = 0
-        for rust_file in repo_path.rglob("*.rs"):
-            if self.is_rust_file(rust_file):
-                contract = self.process_rust_file(rust_file, repo_name)
-                if contract:
-                    self.contracts.append(contract)
-                    count += 1
-                    if count % 100 == 0:
-                        print(f"  Processed {count} files...")
-        
-        print(f"  Found {count} Solana Rust contracts in {repo_name}")
-        return count
-
-    def process_huggingface_datasets(self):
+        for rust_file in rust_files:
+            if rust_file in cached:
+                contract = cached[rust_file]
+            else:
+                contract = next(results)
+                if rust_file in stamps:
+                    cache[str(rust_file)] = (stamps[rust_file], contract)
+            if contract:
+                count += 1
+                if count % 100 == 0:
+                    print(f"  Processed {count} files...")
+                yield contract
+        
+        print(f"  Found {count} Solana Rust contracts in {repo_name} ({len(cached)} files unchanged)")
+
+    def process_repositories(self, executor: ProcessPoolExecutor) -> Iterator[Dict[str, Any]]:
+        """Yield contracts from every downloaded GitHub repository"""
+        repo_dirs = [d for d in self.raw_dir.iterdir() 
+                    if d.is_dir() and not d.name.startswith('hf_') and not d.name.startswith('.')]
+        
+        for repo_dir in repo_dirs:
+            try:
+                yield from self.process_repository(repo_dir, executor)
+            except Exception as e:
+                print(f"Error processing repository {repo_dir}: {e}")
+
+    def process_huggingface_datasets(self) -> Iterator[Dict[str, Any]]:
         """Process Hugging Face datasets"""
         print("Processing Hugging Face datasets...")
         
@@ -128,12 +378,9 @@ class RepositoryProcessor:
             for data_file in data_files:
                 try:
                     if data_file.suffix == '.parquet':
-                        import pandas as pd
-                        df = pd.read_parquet(data_file)
-                        data = df.to_dict('records')
+                        data = iter_parquet_records(data_file)
                     elif data_file.suffix == '.jsonl':
-                        with open(data_file, 'r', encoding='utf-8') as f:
-                            data = [json.loads(line) for line in f]
+                        data = stream_jsonl(data_file)
                     else:
                         with open(data_file, 'r', encoding='utf-8') as f:
                             data = json.load(f)
@@ -145,8 +392,11 @@ class RepositoryProcessor:
                                      record.get('text') or 
                                      record.get('content', ''))
                         
-                        if source_code and self.is_solana_rust(source_code):
-                            vulnerabilities = self.detect_vulnerabilities(source_code)
+                        if not source_code:
+                            continue
+                        source_lower = source_code.lower()
+                        if is_solana_rust(source_lower):
+                            vulnerabilities = detect_vulnerabilities(source_lower)
                             
                             contract = {
                                 "contract_id": f"hf_{hf_dir.name}_{i:06d}",
@@ -156,78 +406,72 @@ class RepositoryProcessor:
                                 "source": f"hf_{hf_dir.name}",
                                 "file_path": f"hf_{hf_dir.name}_{i:06d}.rs"
                             }
-                            self.contracts.append(contract)
+                            yield contract
                             
                 except Exception as e:
                     print(f"Error processing {data_file}: {e}")
 
-    def process_all(self):
-        """Process all repositories and datasets"""
+    def process_all(self, rebuild: bool = False):
+        """Process all repositories and datasets, streaming contracts to JSON Lines"""
         print("Starting comprehensive repository processing...")
         
-        # Process GitHub repositories
-        repo_dirs = [d for d in self.raw_dir.iterdir() 
-                    if d.is_dir() and not d.name.startswith('hf_') and not d.name.startswith('.')]
-        
-        total_repos = 0
-        for repo_dir in repo_dirs:
+        # Contracts go straight to disk; statistics are gathered on the same pass
+        with shelve.open(str(self.cache_file), flag='n' if rebuild else 'c') as cache, \
+                ProcessPoolExecutor(max_workers=os.cpu_count()) as executor, open(self.output_file, 'wb') as f:
+            if cache.get(FILE_CACHE_VERSION_KEY) != FILE_CACHE_VERSION:
+                cache.clear()
+                cache[FILE_CACHE_VERSION_KEY] = FILE_CACHE_VERSION
+            self._file_cache = cache
             try:
-                count = self.process_repository(repo_dir)
-                total_repos += count
-            except Exception as e:
-                print(f"Error processing repository {repo_dir}: {e}")
-        
-        # Process Hugging Face datasets
-        self.process_huggingface_datasets()
+                contracts = chain(self.process_repositories(executor), self.process_huggingface_datasets())
+                stats = self.generate_statistics(write_jsonl(f, contracts))
+            finally:
+                self._file_cache = None
         
-        print(f"\nTotal contracts extracted: {len(self.contracts)}")
-        print(f"From repositories: {total_repos}")
-        print(f"From HF datasets: {len(self.contracts) - total_repos}")
+        from_repos = sum(n for source, n in stats["source_distribution"].items() if source.startswith("repo_"))
+        print(f"\nTotal contracts extracted: {stats['total_contracts']}")
+        print(f"From repositories: {from_repos}")
+        print(f"From HF datasets: {stats['total_contracts'] - from_repos}")
         
-        # Save results
-        with open(self.output_file, 'w', encoding='utf-8') as f:
-            json.dump(self.contracts, f, indent=2, ensure_ascii=False)
-        
-        # Generate statistics
-        self.generate_statistics()
+        stats_file = self.output_file.parent / "extraction_statistics.json"
+        write_json(stats_file, stats)
+        print(f"Statistics saved to: {stats_file}")
         
         print(f"Results saved to: {self.output_file}")
 
-    def generate_statistics(self):
+    def generate_statistics(self, contracts: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
         """Generate statistics about extracted contracts"""
-        total = len(self.contracts)
-        vulnerable = sum(1 for c in self.contracts if c['vulnerabilities'])
-        safe = total - vulnerable
-        
-        # Count by vulnerability type
-        vuln_counts = {}
-        for contract in self.contracts:
-            for vuln in contract['vulnerabilities']:
-                vuln_counts[vuln] = vuln_counts.get(vuln, 0) + 1
-        
-        # Count by source
-        source_counts = {}
-        for contract in self.contracts:
-            source = contract['source']
-            source_counts[source] = source_counts.get(source, 0) + 1
-        
-        stats = {
+        total = 0
+        vulnerable = 0
+        vuln_counts = Counter()
+        source_counts = Counter()
+        
+        # Count by vulnerability type and source in one pass
+        for contract in contracts:
+            total += 1
+            if contract['vulnerabilities']:
+                vulnerable += 1
+            vuln_counts.update(contract['vulnerabilities'])
+            source_counts[contract['source']] += 1
+        
+        return {
             "total_contracts": total,
             "vulnerable_contracts": vulnerable,
-            "safe_contracts": safe,
-            "vulnerability_distribution": vuln_counts,
-            "source_distribution": source_counts
+            "safe_contracts": total - vulnerable,
+            "vulnerability_distribution": dict(vuln_counts),
+            "source_distribution": dict(source_counts)
         }
-        
-        stats_file = self.output_file.parent / "extraction_statistics.json"
-        with open(stats_file, 'w', encoding='utf-8') as f:
-            json.dump(stats, f, indent=2, ensure_ascii=False)
-        
-        print(f"Statistics saved to: {stats_file}")
 
 def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Extract Solana Rust contracts from downloaded repositories and datasets")
+    parser.add_argument("--rebuild", action="store_true", help="Discard the per-file cache and rescan every file")
+    
+    args = parser.parse_args()
+    
     processor = RepositoryProcessor()
-    processor.process_all()
+    processor.process_all(rebuild=args.rebuild)
 
 if __name__ == "__main__":
     main()
@@ -17,6 +17,40 @@ import os
 import re
 from pathlib import Path
 
+# Files to update; patterns are compiled once, replacements are filled in with the program ID
+FILES_TO_UPDATE = [
+    {
+        'path': 'solana-contract/Anchor.toml',
+        'pattern': re.compile(r'securizz = "ReplaceWithDeployedProgramId"'),
+        'replacement': 'securizz = "{program_id}"'
+    },
+    {
+        'path': 'solana-contract/programs/securizz/src/lib.rs',
+        'pattern': re.compile(r'declare_id!\("ReplaceWithDeployedProgramId"\);'),
+        'replacement': 'declare_id!("{program_id}");'
+    },
+    {
+        'path': 'backend-api/env.example',
+        'pattern': re.compile(r'SOLANA_PROGRAM_ID=ReplaceWithDeployedProgramId'),
+        'replacement': 'SOLANA_PROGRAM_ID={program_id}'
+    },
+    {
+        'path': 'oracle-service/env.example',
+        'pattern': re.compile(r'SOLANA_PROGRAM_ID=ReplaceWithDeployedProgramId'),
+        'replacement': 'SOLANA_PROGRAM_ID={program_id}'
+    },
+    {
+        'path': 'frontend/env.example',
+        'pattern': re.compile(r'NEXT_PUBLIC_PROGRAM_ID=ReplaceWithDeployedProgramId'),
+        'replacement': 'NEXT_PUBLIC_PROGRAM_ID={program_id}'
+    },
+    {
+        'path': 'env.example',
+        'pattern': re.compile(r'SOLANA_PROGRAM_ID=ReplaceWithDeployedProgramId'),
+        'replacement': 'SOLANA_PROGRAM_ID={program_id}'
+    }
+]
+
 def update_file(file_path, old_pattern, new_value):
     """Update a file with new program ID"""
     try:
@@ -24,11 +58,14 @@ def update_file(file_path, old_pattern, new_value):
             content = f.read()
         
         # Replace the pattern
-        new_content = re.sub(old_pattern, new_value, content)
+        new_content = old_pattern.sub(new_value, content)
         
         if content != new_content:
-            with open(file_path, 'w') as f:
+            # Write beside the file and swap it in, so an interrupted run never leaves it half-written
+            tmp_path = f"{file_path}.tmp"
+            with open(tmp_path, 'w') as f:
                 f.write(new_content)
+            os.replace(tmp_path, file_path)
             print(f"✅ Updated {file_path}")
             return True
         else:
@@ -54,51 +91,17 @@ def main():
     print(f"🔄 Updating program ID to: {program_id}")
     print("=" * 50)
     
-    # Files to update
-    files_to_update = [
-        {
-            'path': 'solana-contract/Anchor.toml',
-            'pattern': r'securizz = "ReplaceWithDeployedProgramId"',
-            'replacement': f'securizz = "{program_id}"'
-        },
-        {
-            'path': 'solana-contract/programs/securizz/src/lib.rs',
-            'pattern': r'declare_id!\("ReplaceWithDeployedProgramId"\);',
-            'replacement': f'declare_id!("{program_id}");'
-        },
-        {
-            'path': 'backend-api/env.example',
-            'pattern': r'SOLANA_PROGRAM_ID=ReplaceWithDeployedProgramId',
-            'replacement': f'SOLANA_PROGRAM_ID={program_id}'
-        },
-        {
-            'path': 'oracle-service/env.example',
-            'pattern': r'SOLANA_PROGRAM_ID=ReplaceWithDeployedProgramId',
-            'replacement': f'SOLANA_PROGRAM_ID={program_id}'
-        },
-        {
-            'path': 'frontend/env.example',
-            'pattern': r'NEXT_PUBLIC_PROGRAM_ID=ReplaceWithDeployedProgramId',
-            'replacement': f'NEXT_PUBLIC_PROGRAM_ID={program_id}'
-        },
-        {
-            'path': 'env.example',
-            'pattern': r'SOLANA_PROGRAM_ID=ReplaceWithDeployedProgramId',
-            'replacement': f'SOLANA_PROGRAM_ID={program_id}'
-        }
-    ]
-    
     updated_count = 0
-    total_files = len(files_to_update)
+    total_files = len(FILES_TO_UPDATE)
     
-    for file_info in files_to_update:
+    for file_info in FILES_TO_UPDATE:
         file_path = Path(file_info['path'])
         if file_path.exists():
-            if update_file(file_path, file_info['pattern'], file_info['replacement']):
+            replacement = file_info['replacement'].format(program_id=program_id)
+            if update_file(file_path, file_info['pattern'], replacement):
                 updated_count += 1
         else:
             print(f"⚠️  File not found: {file_path}")
-    
     print("=" * 50)
     print(f"✅ Updated {updated_count}/{total_files} files")
     
@@ -2,15 +2,33 @@
 import requests
 import time
 
+BACKEND_URL = 'http://localhost:8000'
+
+# Backoff between readiness probes while the server starts (about 3s in total)
+STARTUP_DELAYS = (0.05, 0.1, 0.2, 0.4, 0.8, 1.6)
+
+def wait_for_backend(session):
+    """Poll the health endpoint until the server accepts connections"""
+    for delay in STARTUP_DELAYS:
+        try:
+            session.get(f'{BACKEND_URL}/health', timeout=1)
+            return
+        except requests.exceptions.RequestException:
+            time.sleep(delay)
+
 def test_backend():
+    with requests.Session() as session:
+        return _test_backend(session)
+
+def _test_backend(session):
     print("Testing backend...")
     
-    # Wait a moment for the server to start
-    time.sleep(2)
+    # Wait for the server to start
+    wait_for_backend(session)
     
     try:
         # Test health endpoint
-        response = requests.get('http://localhost:8000/health', timeout=5)
+        response = session.get(f'{BACKEND_URL}/health', timeout=5)
         print(f"Health endpoint: {response.status_code}")
         if response.status_code == 200:
             print("✅ Backend is running!")
@@ -25,7 +43,7 @@ def test_backend():
             "source_code": "// Test contract\ncontract Test {}",
             "contract_name": "Test"
         }
-        response = requests.post('http://localhost:8000/analyze', json=test_data, timeout=10)
+        response = session.post(f'{BACKEND_URL}/analyze', json=test_data, timeout=10)
         print(f"Analyze endpoint: {response.status_code}")
         if response.status_code == 200:
             print("✅ Analysis endpoint working!")